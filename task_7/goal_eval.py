@@ -0,0 +1,183 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Set, Tuple, Union
+
+from production import AND, OR, NOT, compile_pattern, _datum_tokens
+
+Tokens = Tuple[str, ...]
+
+
+class FactStore:
+    """
+    A set of facts indexed for leaf checks. Facts are compared token by
+    token (like match()), so extra whitespace does not matter.
+
+    Ground leaves are a set lookup; leaves with variables are matched only
+    against the facts sharing their rarest constant token.
+    """
+
+    def __init__(self, facts: Iterable[str] = ()):
+        self._facts: Set[Tokens] = set()
+        self._by_arity: Dict[int, Set[Tokens]] = {}
+        self._by_token: Dict[Tuple[int, int, str], Set[Tokens]] = {}
+        self.version = 0  # bumped by every new fact
+        for fact in facts:
+            self.add(fact)
+
+    def __len__(self):
+        return len(self._facts)
+
+    def __contains__(self, fact: str) -> bool:
+        return _datum_tokens(fact) in self._facts
+
+    def add(self, fact: str) -> None:
+        toks = _datum_tokens(fact)
+        if toks in self._facts:
+            return
+        self._facts.add(toks)
+        self.version += 1
+        n = len(toks)
+        self._by_arity.setdefault(n, set()).add(toks)
+        for pos, tok in enumerate(toks):
+            self._by_token.setdefault((n, pos, tok), set()).add(toks)
+
+    def _candidates(self, leaf: str) -> Iterable[Tokens]:
+        cp = compile_pattern(leaf)
+        best = self._by_arity.get(cp.arity, set())
+        for pos, tok in cp.consts:
+            bucket = self._by_token.get((cp.arity, pos, tok))
+            if bucket is None:
+                return ()
+            if len(bucket) < len(best):
+                best = bucket
+        return best
+
+    def cost(self, leaf: str) -> int:
+        """Estimated work to check `leaf`: 1 for a ground leaf, else candidate count."""
+        cp = compile_pattern(leaf)
+        if not cp.var_slots:
+            return 1
+        return 1 + len(self._candidates(leaf))
+
+    def holds(self, leaf: str) -> bool:
+        """True if some fact matches `leaf` (its variables are existential)."""
+        cp = compile_pattern(leaf)
+        if not cp.var_slots:
+            return _datum_tokens(leaf) in self._facts
+        return any(cp.match_tokens(toks) is not None for toks in self._candidates(leaf))
+
+    def holds_many(self, leaves: Iterable[str]) -> Dict[str, bool]:
+        """
+        Check many leaves at once: all ground leaves in one set intersection,
+        the rest one by one against their index buckets.
+        """
+        ground: Dict[Tokens, List[str]] = {}
+        out: Dict[str, bool] = {}
+        for leaf in leaves:
+            if compile_pattern(leaf).var_slots:
+                out[leaf] = self.holds(leaf)
+            else:
+                ground.setdefault(_datum_tokens(leaf), []).append(leaf)
+        true = self._facts.intersection(ground)
+        for toks, group in ground.items():
+            for leaf in group:
+                out[leaf] = toks in true
+        return out
+
+
+class GoalTreeEvaluator:
+    """
+    Decides an AND/OR goal tree (from backchain_to_goal_tree) against a
+    FactStore.
+
+      - OR is true as soon as one child is; AND is false as soon as one is not
+      - children are tried cheapest first (estimated from the fact indexes)
+      - every distinct subtree is evaluated at most once, so shared subtrees
+        of the goal-tree DAG cost nothing the second time; the memo is kept
+        across evaluate() calls until facts are added to the store
+      - with batch=True all distinct leaves are checked up front in one pass
+
+    Leaves are checked independently: a variable left in a leaf such as
+    "(?y) is a bird" means "some fact matches", not a join with its siblings.
+    """
+
+    def __init__(self, facts: Union[FactStore, Iterable[str]], batch: bool = False):
+        self.facts = facts if isinstance(facts, FactStore) else FactStore(facts)
+        self.batch = batch
+        self._truth: Dict[Any, bool] = {}
+        self._cost: Dict[Any, int] = {}
+        self._version = self.facts.version  # fact-store version the memos hold for
+
+    @staticmethod
+    def _key(node: Any) -> Any:
+        try:
+            hash(node)
+            return node
+        except TypeError:
+            return ("id", id(node))
+
+    def cost(self, node: Any) -> int:
+        key = self._key(node)
+        if key in self._cost:
+            return self._cost[key]
+        if isinstance(node, str):
+            c = self.facts.cost(node)
+        elif isinstance(node, NOT):
+            c = self.cost(node.x)
+        elif isinstance(node, (AND, OR, list)):
+            c = sum(self.cost(x) for x in node)
+        else:
+            c = 1
+        self._cost[key] = c
+        return c
+
+    def _leaves(self, tree: Any) -> Set[str]:
+        leaves: Set[str] = set()
+        seen: Set[Any] = set()
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                leaves.add(node)
+                continue
+            key = self._key(node)
+            if key in seen:
+                continue
+            seen.add(key)
+            if isinstance(node, NOT):
+                stack.append(node.x)
+            elif isinstance(node, (AND, OR, list)):
+                stack.extend(node)
+        return leaves
+
+    def evaluate(self, tree: Any) -> bool:
+        if self._version != self.facts.version:
+            self._truth.clear()
+            self._cost.clear()
+            self._version = self.facts.version
+        if self.batch:
+            todo = [leaf for leaf in self._leaves(tree) if leaf not in self._truth]
+            self._truth.update(self.facts.holds_many(todo))
+        return self._eval(tree)
+
+    def _eval(self, node: Any) -> bool:
+        key = self._key(node)
+        if key in self._truth:
+            return self._truth[key]
+        if isinstance(node, str):
+            value = self.facts.holds(node)
+        elif isinstance(node, NOT):
+            value = not self._eval(node.x)
+        elif isinstance(node, OR):
+            value = any(self._eval(x) for x in sorted(node, key=self.cost))
+        elif isinstance(node, (AND, list)):
+            value = all(self._eval(x) for x in sorted(node, key=self.cost))
+        else:
+            raise TypeError(f"Unsupported goal-tree node: {node!r}")
+        self._truth[key] = value
+        return value
+
+
+def evaluate_goal_tree(tree: Any, facts: Union[FactStore, Iterable[str]],
+                       batch: bool = False) -> bool:
+    """True if the AND/OR `tree` is satisfied by `facts`."""
+    return GoalTreeEvaluator(facts, batch=batch).evaluate(tree)
@@ -1,20 +1,142 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Optional, Set, Tuple
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+import re
 
-from production import AND, OR, NOT, Rule, match, populate, simplify
+from production import AND, OR, NOT, VAR_RE, Rule, RuleIndex, populate, simplify
 
+Rules = Union[List[Rule], RuleIndex]
 
-def _as_list(x):
-    return x if isinstance(x, list) else [x]
 
+def _patterns(expr: Any):
+    if isinstance(expr, str):
+        yield expr
+    elif isinstance(expr, NOT):
+        yield from _patterns(expr.x)
+    elif isinstance(expr, (list, AND, OR)):
+        for x in expr:
+            yield from _patterns(x)
 
-def backchain_to_goal_tree(rules: List[Rule], hypothesis: str) -> Any:
+
+class GoalTreeCache:
+    """
+    Goal trees kept across backchain_to_goal_tree calls.
+
+    Hypothesis tokens that occur nowhere in the rules (usually the entity
+    name, e.g. "opus" in "opus is a penguin") cannot change how the rules
+    apply, so they are replaced by placeholder variables before lookup.
+    "opus is a penguin" and "tweety is a penguin" then share the cached
+    tree for "(?__g0) is a penguin", which is instantiated by substitution.
+
+    Entries are dropped when the rule set's fingerprint changes, and the
+    least recently used entry is evicted once `maxsize` is reached. A plain
+    list is fingerprinted on every lookup, so in-place edits are seen; a
+    RuleIndex is checked in O(1) through its version counter.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._trees: "OrderedDict[str, Any]" = OrderedDict()
+        self._fingerprint: Any = None
+        self._vocab: Set[str] = set()
+        self._embedded_vars = False
+        self._prefix = "__g"
+
+    def clear(self) -> None:
+        self._trees.clear()
+        self._fingerprint = None
+
+    @staticmethod
+    def fingerprint(rules: Rules) -> Any:
+        """O(1) for a RuleIndex (its version counter), O(rules) for a list."""
+        if isinstance(rules, RuleIndex):
+            return ("index", id(rules), rules.version, len(rules))
+        try:
+            return ("list", hash(tuple(rules)), len(rules))
+        except TypeError:  # list-valued consequents
+            return ("list", hash(repr(rules)), len(rules))
+
+    def _sync(self, rules: Rules) -> None:
+        fp = self.fingerprint(rules)
+        if fp == self._fingerprint:
+            return
+        self._trees.clear()
+        self._fingerprint = fp
+
+        vocab: Set[str] = set()
+        var_names: Set[str] = set()
+        for rule in rules:
+            for pat in _patterns([rule.antecedent, rule.consequent]):
+                var_names.update(VAR_RE.findall(pat))
+                vocab.update(t for t in pat.split() if not VAR_RE.fullmatch(t))
+        self._vocab = vocab
+        # A constant token like "(?x)'s" builds new tokens out of bindings, so
+        # then a goal token must not even occur inside a rule token.
+        self._embedded_vars = any(VAR_RE.search(t) for t in vocab)
+        self._prefix = "__g"
+        while any(v.startswith(self._prefix) for v in var_names):
+            self._prefix += "_"
+
+    def _generic(self, token: str) -> bool:
+        if VAR_RE.fullmatch(token) or token in self._vocab:
+            return False
+        if self._embedded_vars:
+            return not any(token in t for t in self._vocab)
+        return True
+
+    def canonicalise(self, hypothesis: str) -> Tuple[str, Dict[str, str]]:
+        """Return (cache key, bindings that turn the key back into `hypothesis`)."""
+        names: Dict[str, str] = {}
+
+        def repl(m):
+            tok = m.group(0)
+            if not self._generic(tok):
+                return tok
+            if tok not in names:
+                names[tok] = f"{self._prefix}{len(names)}"
+            return f"(?{names[tok]})"
+
+        key = re.sub(r"\S+", repl, hypothesis)
+        return key, {var: tok for tok, var in names.items()}
+
+    def lookup(self, rules: Rules, hypothesis: str) -> Any:
+        self._sync(rules)
+        key, bindings = self.canonicalise(hypothesis)
+        tree = self._trees.get(key)
+        if tree is None:
+            self.misses += 1
+            tree = _backchain(rules, key)
+            self._trees[key] = tree
+            if len(self._trees) > self.maxsize:
+                self._trees.popitem(last=False)
+        else:
+            self.hits += 1
+            self._trees.move_to_end(key)
+        return populate(tree, bindings) if bindings else tree
+
+
+GOAL_TREE_CACHE = GoalTreeCache()
+
+
+def backchain_to_goal_tree(rules: Rules, hypothesis: str,
+                           cache: Optional[GoalTreeCache] = GOAL_TREE_CACHE) -> Any:
     """
     Takes a hypothesis (string) and a list of rules (Rule objects),
     returning an AND/OR tree of subgoals needed to prove the hypothesis.
+    Pass a prebuilt RuleIndex instead of a list to reuse it across calls.
+    Trees are reused across calls through `cache` (None disables it).
 
     Leaves are strings. Internal nodes are AND(...) or OR(...).
     """
+    if cache is not None:
+        return cache.lookup(rules, hypothesis)
+    return _backchain(rules, hypothesis)
+
+
+def _backchain(rules: Rules, hypothesis: str) -> Any:
+    index = rules if isinstance(rules, RuleIndex) else RuleIndex(rules)
     memo: Dict[str, Any] = {}
     visiting: Set[str] = set()
 
@@ -31,37 +153,31 @@ def backchain_to_goal_tree(rules: List[Rule], hypothesis: str) -> Any:
         # Always include the goal itself as a valid leaf in the OR tree
         options: List[Any] = [goal]
 
-        for rule in rules:
-            consequents = _as_list(rule.consequent)
-
-            for cons in consequents:
-                if not isinstance(cons, str):
-                    continue
-
-                bindings = match(cons, goal)
-                if bindings is None:
-                    continue
+        for rule, cons in index.candidates(goal):
+            bindings = cons.match(goal)
+            if bindings is None:
+                continue
 
-                ant = populate(rule.antecedent, bindings)
+            ant = populate(rule.antecedent, bindings)
 
-                # Recursively backchain the antecedent
-                if isinstance(ant, str):
-                    options.append(bc(ant))
+            # Recursively backchain the antecedent
+            if isinstance(ant, str):
+                options.append(bc(ant))
 
-                elif isinstance(ant, AND):
-                    options.append(AND([bc(x) if isinstance(x, str) else x for x in ant]))
+            elif isinstance(ant, AND):
+                options.append(AND([bc(x) if isinstance(x, str) else x for x in ant]))
 
-                elif isinstance(ant, OR):
-                    options.append(OR([bc(x) if isinstance(x, str) else x for x in ant]))
+            elif isinstance(ant, OR):
+                options.append(OR([bc(x) if isinstance(x, str) else x for x in ant]))
 
-                elif isinstance(ant, NOT):
-                    # Keep NOT as-is (still a leaf-like constraint)
-                    # In some assignments you might want to backchain inside NOT,
-                    # but most Task 7 backward-chainers keep it as a leaf.
-                    options.append(ant)
+            elif isinstance(ant, NOT):
+                # Keep NOT as-is (still a leaf-like constraint)
+                # In some assignments you might want to backchain inside NOT,
+                # but most Task 7 backward-chainers keep it as a leaf.
+                options.append(ant)
 
-                else:
-                    options.append(ant)
+            else:
+                options.append(ant)
 
         tree = simplify(OR(options))
         memo[goal] = tree
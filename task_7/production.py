@@ -1,29 +1,115 @@
 from __future__ import annotations
+from collections.abc import Sequence
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
 import re
+import sys
+import weakref
 
 Bindings = Dict[str, str]
 
 VAR_RE = re.compile(r"\(\?([a-zA-Z_]\w*)\)")  # matches (?x), (?animal), etc.
 
+PATTERN_CACHE_SIZE = 65536
 
-class AND(list):
+
+class _Node(Sequence):
+    """
+    Immutable, hash-consed goal-tree node. Constructing a node whose class and
+    children equal an existing live node returns that node, so identical
+    subtrees are shared (the tree is a DAG), equality of interned nodes is
+    identity, and the structural hash is computed once.
+    """
+    __slots__ = ("_items", "_hash", "_simple", "__weakref__")
+
+    def __new__(cls, items: Iterable[Any] = ()):
+        items = tuple(items)
+        key = (cls, items)
+        try:
+            node = _INTERNED.get(key)
+        except TypeError:  # an unhashable child (e.g. a plain list): don't intern
+            key = None
+            node = None
+        if node is not None:
+            return node
+        node = object.__new__(cls)
+        node._items = items
+        node._hash = None if key is None else hash(key)
+        node._simple = False  # set once simplify() has produced this node
+        if key is not None:
+            _INTERNED[key] = node
+        return node
+
+    def __init__(self, items: Iterable[Any] = ()):
+        pass
+
+    def __reduce__(self):
+        return (type(self), (list(self._items),))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, i):
+        return self._items[i]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __hash__(self):
+        if self._hash is None:
+            raise TypeError(f"unhashable {type(self).__name__}: has unhashable children")
+        return self._hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if type(other) is not type(self):
+            return NotImplemented
+        if self._hash is not None and other._hash is not None:
+            return False  # both interned, so equal nodes would be the same object
+        return self._items == other._items
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+
+_INTERNED: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+
+
+class AND(_Node):
     """AND([a,b,c]) means all subgoals must be true."""
+    __slots__ = ()
+
     def __repr__(self):
-        return f"AND({list.__repr__(self)})"
+        return f"AND({list(self._items)!r})"
 
 
-class OR(list):
+class OR(_Node):
     """OR([a,b,c]) means any subgoal can be true."""
+    __slots__ = ()
+
     def __repr__(self):
-        return f"OR({list.__repr__(self)})"
+        return f"OR({list(self._items)!r})"
 
 
-class NOT:
+class NOT(_Node):
     """NOT(x) means x must be false (used in some forward-chaining tasks)."""
+    __slots__ = ()
+
+    def __new__(cls, x):
+        return super().__new__(cls, (x,))
+
     def __init__(self, x):
-        self.x = x
+        pass
+
+    def __reduce__(self):
+        return (NOT, (self.x,))
+
+    @property
+    def x(self):
+        return self._items[0]
 
     def __repr__(self):
         return f"NOT({self.x!r})"
@@ -61,29 +147,80 @@ def _tokenize_pattern(pat: str) -> List[str]:
     return pat.strip().split()
 
 
-def match(pattern: str, datum: str) -> Optional[Bindings]:
+class CompiledPattern:
+    """
+    A pattern string parsed once: its token arity, which positions hold
+    constants and which hold variables, plus the pieces needed to rebuild it
+    with bindings substituted. Get one through compile_pattern(), which caches.
+    """
+    __slots__ = ("pattern", "arity", "consts", "var_slots", "_pieces", "_var_pieces")
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        tokens = _tokenize_pattern(pattern)
+        self.arity = len(tokens)
+        consts: List[Tuple[int, str]] = []
+        var_slots: List[Tuple[int, str]] = []
+        for i, tok in enumerate(tokens):
+            m = VAR_RE.fullmatch(tok)
+            if m:
+                var_slots.append((i, m.group(1)))
+            else:
+                consts.append((i, sys.intern(tok)))
+        self.consts: Tuple[Tuple[int, str], ...] = tuple(consts)
+        self.var_slots: Tuple[Tuple[int, str], ...] = tuple(var_slots)
+
+        # VAR_RE.split gives [text, var, text, var, ..., text]
+        self._pieces = VAR_RE.split(pattern)
+        self._var_pieces = tuple((i, self._pieces[i]) for i in range(1, len(self._pieces), 2))
+
+    def __repr__(self):
+        return f"CompiledPattern({self.pattern!r})"
+
+    def match(self, datum: str) -> Optional[Bindings]:
+        return self.match_tokens(_datum_tokens(datum))
+
+    def match_tokens(self, d_tokens: Tuple[str, ...]) -> Optional[Bindings]:
+        if len(d_tokens) != self.arity:
+            return None
+        for pos, tok in self.consts:
+            if d_tokens[pos] != tok:
+                return None
+        binds: Bindings = {}
+        for pos, var in self.var_slots:
+            d = d_tokens[pos]
+            if binds.setdefault(var, d) != d:
+                return None
+        return binds
+
+    def populate(self, bindings: Bindings) -> str:
+        if not self._var_pieces:
+            return self.pattern
+        pieces = list(self._pieces)
+        for i, var in self._var_pieces:
+            pieces[i] = bindings.get(var, f"(?{var})")
+        return "".join(pieces)
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compile_pattern(pattern: str) -> CompiledPattern:
+    return CompiledPattern(pattern)
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def _datum_tokens(datum: str) -> Tuple[str, ...]:
+    return tuple(sys.intern(t) for t in _tokenize_pattern(datum))
+
+
+def match(pattern: Union[str, CompiledPattern], datum: str) -> Optional[Bindings]:
     """
     Unify a single pattern string against a single datum string.
     Variables are of the form (?x).
     Returns dict bindings if match succeeds, else None.
     """
-    p_tokens = _tokenize_pattern(pattern)
-    d_tokens = _tokenize_pattern(datum)
-    if len(p_tokens) != len(d_tokens):
-        return None
-
-    binds: Bindings = {}
-    for p, d in zip(p_tokens, d_tokens):
-        m = VAR_RE.fullmatch(p)
-        if m:
-            var = m.group(1)
-            if var in binds and binds[var] != d:
-                return None
-            binds[var] = d
-        else:
-            if p != d:
-                return None
-    return binds
+    if not isinstance(pattern, CompiledPattern):
+        pattern = compile_pattern(pattern)
+    return pattern.match(datum)
 
 
 def populate(template: Any, bindings: Bindings) -> Any:
@@ -92,40 +229,80 @@ def populate(template: Any, bindings: Bindings) -> Any:
     Works for: strings, AND/OR structures, NOT, lists.
     """
     if isinstance(template, str):
-        def repl(m):
-            var = m.group(1)
-            return bindings.get(var, f"(?{var})")
-        return VAR_RE.sub(repl, template)
+        return compile_pattern(template).populate(bindings)
+    if isinstance(template, CompiledPattern):
+        return template.populate(bindings)
+    return _populate_tree(template, bindings, {})
 
-    if isinstance(template, AND):
-        return AND([populate(x, bindings) for x in template])
-    if isinstance(template, OR):
-        return OR([populate(x, bindings) for x in template])
-    if isinstance(template, NOT):
-        return NOT(populate(template.x, bindings))
-    if isinstance(template, list):
-        return [populate(x, bindings) for x in template]
 
-    return template
+def _populate_tree(template: Any, bindings: Bindings, memo: Dict[int, Any]) -> Any:
+    # Goal trees are DAGs of shared nodes; `memo` (keyed on node identity)
+    # rebuilds each shared subtree once instead of once per path to it.
+    if isinstance(template, str):
+        return compile_pattern(template).populate(bindings)
+    if isinstance(template, CompiledPattern):
+        return template.populate(bindings)
+    if isinstance(template, list):  # mutable, so never shared in the result
+        return [_populate_tree(x, bindings, memo) for x in template]
+    if not isinstance(template, _Node):
+        return template
+
+    done = memo.get(id(template))
+    if done is not None:
+        return done
+    if isinstance(template, AND):
+        out = AND([_populate_tree(x, bindings, memo) for x in template])
+    elif isinstance(template, OR):
+        out = OR([_populate_tree(x, bindings, memo) for x in template])
+    elif isinstance(template, NOT):
+        out = NOT(_populate_tree(template.x, bindings, memo))
+    else:
+        return template
+    memo[id(template)] = out
+    return out
 
 
 def simplify(expr: Any) -> Any:
     """
     Flatten nested AND/OR, remove duplicates, collapse singletons.
     Keeps strings as-is.
+
+    Shared subtrees are simplified once per call, and nodes that are already
+    the output of simplify() are returned untouched, so a pass is linear in
+    the number of distinct nodes.
     """
+    return _simplify(expr, {})
+
+
+def _dedupe_key(it: Any) -> Any:
+    try:
+        hash(it)
+        return it
+    except TypeError:
+        return ("repr", repr(it))
+
+
+def _simplify(expr: Any, memo: Dict[Any, Any]) -> Any:
     if isinstance(expr, str):
         return expr
+    if not isinstance(expr, _Node):
+        return expr
+    if expr._simple:
+        return expr
 
-    if isinstance(expr, NOT):
-        return NOT(simplify(expr.x))
+    key = expr if expr._hash is not None else id(expr)
+    if key in memo:
+        return memo[key]
 
-    if isinstance(expr, AND):
+    if isinstance(expr, NOT):
+        out = NOT(_simplify(expr.x, memo))
+    else:
+        cls = type(expr)
         items: List[Any] = []
         for x in expr:
-            sx = simplify(x)
-            if isinstance(sx, AND):
-                items.extend(list(sx))
+            sx = _simplify(x, memo)
+            if isinstance(sx, cls):
+                items.extend(sx)
             else:
                 items.append(sx)
 
@@ -133,34 +310,100 @@ def simplify(expr: Any) -> Any:
         seen = set()
         deduped = []
         for it in items:
-            key = repr(it)
-            if key not in seen:
-                seen.add(key)
+            k = _dedupe_key(it)
+            if k not in seen:
+                seen.add(k)
                 deduped.append(it)
 
-        if len(deduped) == 1:
-            return deduped[0]
-        return AND(deduped)
-
-    if isinstance(expr, OR):
-        items: List[Any] = []
-        for x in expr:
-            sx = simplify(x)
-            if isinstance(sx, OR):
-                items.extend(list(sx))
-            else:
-                items.append(sx)
+        out = deduped[0] if len(deduped) == 1 else cls(deduped)
 
-        seen = set()
-        deduped = []
-        for it in items:
-            key = repr(it)
-            if key not in seen:
-                seen.add(key)
-                deduped.append(it)
+    if isinstance(out, _Node):
+        out._simple = True
+    memo[key] = out
+    return out
 
-        if len(deduped) == 1:
-            return deduped[0]
-        return OR(deduped)
 
-    return expr
\ No newline at end of file
+class RuleIndex:
+    """
+    Rules indexed by their (string) consequents, for backward chaining.
+
+    Consequents live in a discrimination trie per token arity: each level is
+    one token position, with a branch per constant token plus a wildcard
+    branch for variables. candidates(goal) walks only the branches the goal's
+    tokens can reach, so lookup cost depends on the goal, not on the number
+    of rules. Iterating the index yields the rules in insertion order, so it
+    can be passed anywhere a rule list is expected.
+    """
+    _WILD = None  # trie key for a variable position
+
+    def __init__(self, rules: Iterable[Rule] = ()):
+        self._rules: Dict[int, Rule] = {}  # seq -> rule, in insertion order
+        self._roots: Dict[int, dict] = {}  # arity -> trie
+        self._seq = 0
+        self.version = 0  # bumped on every add/remove
+        for rule in rules:
+            self.add(rule)
+
+    def __iter__(self):
+        return iter(self._rules.values())
+
+    def __len__(self):
+        return len(self._rules)
+
+    def _leaves(self, rule: Rule, seq: int):
+        """Yield (trie leaf list, entry) for every string consequent of `rule`."""
+        consequents = rule.consequent if isinstance(rule.consequent, (list, AND, OR)) else [rule.consequent]
+        for j, cons in enumerate(consequents):
+            if not isinstance(cons, str):
+                continue
+            cp = compile_pattern(cons)
+            node = self._roots.setdefault(cp.arity, {})
+            consts = dict(cp.consts)
+            for pos in range(cp.arity):
+                node = node.setdefault(consts.get(pos, self._WILD), {})
+            yield node.setdefault("leaf", []), ((seq, j), rule, cp)
+
+    def add(self, rule: Rule) -> None:
+        seq = self._seq
+        self._seq += 1
+        self._rules[seq] = rule
+        for leaf, entry in self._leaves(rule, seq):
+            leaf.append(entry)
+        self.version += 1
+
+    def remove(self, rule: Rule) -> None:
+        """Remove one occurrence of `rule` (ValueError if absent)."""
+        seq = next((s for s, r in self._rules.items() if r is rule), None)
+        if seq is None:
+            seq = next((s for s, r in self._rules.items() if r == rule), None)
+        if seq is None:
+            raise ValueError(f"{rule!r} is not in the index")
+        del self._rules[seq]
+        for leaf, entry in list(self._leaves(rule, seq)):
+            leaf[:] = [e for e in leaf if e[0] != entry[0]]
+        self.version += 1
+
+    def candidates(self, goal: str) -> List[Tuple[Rule, CompiledPattern]]:
+        """
+        (rule, consequent) pairs whose consequent might match `goal`, in the
+        same order a linear scan over the rules would visit them.
+        """
+        tokens = _datum_tokens(goal)
+        root = self._roots.get(len(tokens))
+        if root is None:
+            return []
+        found = []
+        stack = [(root, 0)]
+        while stack:
+            node, pos = stack.pop()
+            if pos == len(tokens):
+                found.extend(node.get("leaf", ()))
+                continue
+            child = node.get(tokens[pos])
+            if child is not None:
+                stack.append((child, pos + 1))
+            child = node.get(self._WILD)
+            if child is not None:
+                stack.append((child, pos + 1))
+        found.sort(key=lambda e: e[0])
+        return [(rule, cp) for _, rule, cp in found]
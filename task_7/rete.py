@@ -0,0 +1,283 @@
+from __future__ import annotations
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from production import AND, OR, NOT, VAR_RE, Bindings, CompiledPattern, Rule, compile_pattern, populate
+
+
+# Rete network for forward chaining over production rules.
+#
+#   alpha memories  one per distinct pattern shape (arity, constant tokens,
+#                   repeated-variable positions); facts are dispatched to them
+#                   by hashing their tokens at the constant positions
+#   beta joins      one chain per rule (per OR-branch); each join keeps its
+#                   left tokens and its alpha facts hashed on the variables it
+#                   shares with the conditions before it
+#   NOT             checked against the alpha memories when the rule fires
+#
+# So a new fact only touches alpha memories whose constants it matches, and
+# from there only the join buckets that agree on the shared variables.
+
+Tokens = Tuple[str, ...]
+
+
+def _as_list(x):
+    return x if isinstance(x, (list, AND, OR)) else [x]
+
+
+class _Alpha:
+    """All facts matching one pattern shape, plus hash indexes over them."""
+    __slots__ = ("eq_pairs", "facts", "indexes", "roots", "waiting")
+
+    def __init__(self, eq_pairs: Tuple[Tuple[int, int], ...]):
+        self.eq_pairs = eq_pairs
+        self.facts: List[Tokens] = []
+        self.indexes: Dict[Tuple[int, ...], Dict[Tokens, List[Tokens]]] = {}
+        # Productions whose first condition is this pattern.
+        self.roots: List["_Production"] = []
+        # Later joins on this pattern, found by the join key of the left tokens
+        # waiting there, so a fact skips every rule with nothing to join with:
+        # join positions -> key -> [(production, level)]
+        self.waiting: Dict[Tuple[int, ...], Dict[Tokens, List[Tuple["_Production", int]]]] = {}
+
+    def accepts(self, toks: Tokens) -> bool:
+        return all(toks[a] == toks[b] for a, b in self.eq_pairs)
+
+    def index_on(self, positions: Tuple[int, ...]) -> Dict[Tokens, List[Tokens]]:
+        idx = self.indexes.get(positions)
+        if idx is None:
+            idx = self.indexes[positions] = {}
+            for toks in self.facts:
+                idx.setdefault(tuple(toks[p] for p in positions), []).append(toks)
+        return idx
+
+    def insert(self, toks: Tokens) -> None:
+        self.facts.append(toks)
+        for positions, idx in self.indexes.items():
+            idx.setdefault(tuple(toks[p] for p in positions), []).append(toks)
+
+
+class _Condition:
+    """One positive (or negated) pattern of a production, wired to its alpha memory."""
+    __slots__ = ("alpha", "join_vars", "join_positions", "new_vars", "index")
+
+    def __init__(self, alpha: _Alpha, pattern: CompiledPattern, bound: set):
+        self.alpha = alpha
+        first: Dict[str, int] = {}
+        for pos, var in pattern.var_slots:
+            first.setdefault(var, pos)
+        self.join_vars = tuple(v for v in first if v in bound)
+        self.join_positions = tuple(first[v] for v in self.join_vars)
+        self.new_vars = tuple((v, p) for v, p in first.items() if v not in bound)
+        self.index = alpha.index_on(self.join_positions)
+
+    def key(self, token: Bindings) -> Tokens:
+        return tuple(token[v] for v in self.join_vars)
+
+    def extend(self, token: Bindings, toks: Tokens) -> Bindings:
+        new = dict(token)
+        for var, pos in self.new_vars:
+            new[var] = toks[pos]
+        return new
+
+
+class _Production:
+    """One conjunctive branch of a rule: positive joins, NOT tests, consequents."""
+    __slots__ = ("rule", "conds", "negs", "consequents", "left")
+
+    def __init__(self, rule: Rule):
+        self.rule = rule
+        self.conds: List[_Condition] = []
+        self.negs: List[Any] = []
+        self.consequents = [c for c in _as_list(rule.consequent) if isinstance(c, str)]
+        self.left: List[Dict[Tokens, List[Bindings]]] = []
+
+
+def _dnf(expr: Any) -> List[List[Any]]:
+    """Antecedent -> list of conjunctions; each item is a pattern string or a NOT."""
+    if isinstance(expr, str):
+        return [[expr]]
+    if isinstance(expr, NOT):
+        return [[expr]]
+    if isinstance(expr, OR):
+        return [conj for x in expr for conj in _dnf(x)]
+    if isinstance(expr, (AND, list)):
+        out: List[List[Any]] = [[]]
+        for x in expr:
+            out = [a + b for a in out for b in _dnf(x)]
+        return out
+    raise TypeError(f"Unsupported antecedent: {expr!r}")
+
+
+class ReteNetwork:
+    """
+    Incremental matcher for a fixed rule set. Facts are added with
+    `add_fact`; `run` fires activations (in FIFO order) until quiescence.
+    """
+
+    def __init__(self, rules: Iterable[Rule]):
+        self.facts: Dict[str, None] = {}  # insertion-ordered set
+        self.agenda: Deque[Tuple[_Production, Bindings]] = deque()
+        self._alphas: Dict[Any, _Alpha] = {}
+        # arity -> constant positions -> constant tokens -> alpha memories
+        self._dispatch: Dict[int, Dict[Tuple[int, ...], Dict[Tokens, List[_Alpha]]]] = {}
+
+        for rule in rules:
+            for conj in _dnf(rule.antecedent):
+                self._add_production(rule, conj)
+
+    # -- building -------------------------------------------------------------
+
+    def _alpha_for(self, pattern: CompiledPattern) -> _Alpha:
+        mask = tuple(p for p, _ in pattern.consts)
+        values = tuple(t for _, t in pattern.consts)
+        first: Dict[str, int] = {}
+        eq_pairs = []
+        for pos, var in pattern.var_slots:
+            if var in first:
+                eq_pairs.append((first[var], pos))
+            else:
+                first[var] = pos
+        key = (pattern.arity, mask, values, tuple(eq_pairs))
+        alpha = self._alphas.get(key)
+        if alpha is None:
+            alpha = self._alphas[key] = _Alpha(tuple(eq_pairs))
+            by_mask = self._dispatch.setdefault(pattern.arity, {}).setdefault(mask, {})
+            by_mask.setdefault(values, []).append(alpha)
+            for fact in self.facts:
+                toks = tuple(fact.split())
+                if len(toks) == pattern.arity and alpha.accepts(toks) \
+                        and all(toks[p] == t for p, t in pattern.consts):
+                    alpha.insert(toks)
+        return alpha
+
+    def _add_production(self, rule: Rule, conj: List[Any]) -> None:
+        prod = _Production(rule)
+        bound: set = set()
+        for item in conj:
+            if isinstance(item, NOT):
+                prod.negs.append(item)
+                for p in _patterns_in(item.x):
+                    self._alpha_for(compile_pattern(p))
+                continue
+            pattern = compile_pattern(item)
+            cond = _Condition(self._alpha_for(pattern), pattern, bound)
+            if not prod.conds:
+                cond.alpha.roots.append(prod)
+            prod.conds.append(cond)
+            prod.left.append({})
+            bound.update(v for v, _ in cond.new_vars)
+
+        if not prod.conds:
+            self.agenda.append((prod, {}))
+            return
+        # Replay facts that are already in the network.
+        for toks in list(prod.conds[0].alpha.facts):
+            self._left(prod, 1, prod.conds[0].extend({}, toks))
+
+    # -- matching -------------------------------------------------------------
+
+    def add_fact(self, fact: str) -> bool:
+        """Assert `fact`; returns False if it was already known."""
+        if fact in self.facts:
+            return False
+        self.facts[fact] = None
+        toks = tuple(fact.split())
+        for mask, by_values in self._dispatch.get(len(toks), {}).items():
+            for alpha in by_values.get(tuple(toks[p] for p in mask), ()):
+                if alpha.accepts(toks):
+                    alpha.insert(toks)
+                    self._right(alpha, toks)
+        return True
+
+    def _right(self, alpha: _Alpha, toks: Tokens) -> None:
+        # Snapshot the matching left tokens first: tokens created while this
+        # fact propagates already meet it through their own left activation,
+        # so a fact feeding two joins of one rule pairs with itself only once.
+        pending = []
+        for positions, by_key in alpha.waiting.items():
+            key = tuple(toks[p] for p in positions)
+            for prod, level in by_key.get(key, ()):
+                pending.append((prod, level, list(prod.left[level][key])))
+        for prod in alpha.roots:
+            self._left(prod, 1, prod.conds[0].extend({}, toks))
+        for prod, level, tokens in pending:
+            cond = prod.conds[level]
+            for token in tokens:
+                self._left(prod, level + 1, cond.extend(token, toks))
+
+    def _left(self, prod: _Production, level: int, token: Bindings) -> None:
+        if level == len(prod.conds):
+            self.agenda.append((prod, token))
+            return
+        cond = prod.conds[level]
+        key = cond.key(token)
+        bucket = prod.left[level].get(key)
+        if bucket is None:
+            bucket = prod.left[level][key] = []
+            cond.alpha.waiting.setdefault(cond.join_positions, {}) \
+                .setdefault(key, []).append((prod, level))
+        bucket.append(token)
+        for toks in cond.index.get(key, ()):
+            self._left(prod, level + 1, cond.extend(token, toks))
+
+    # -- NOT ------------------------------------------------------------------
+
+    def _satisfiable(self, expr: Any, token: Bindings) -> bool:
+        """Is there any way to satisfy `expr` from the current facts, given `token`?"""
+        return any(self._satisfy_conj(conj, 0, token) for conj in _dnf(expr))
+
+    def _satisfy_conj(self, conj: List[Any], i: int, token: Bindings) -> bool:
+        if i == len(conj):
+            return True
+        item = conj[i]
+        if isinstance(item, NOT):
+            return (not self._satisfiable(item.x, token)
+                    and self._satisfy_conj(conj, i + 1, token))
+        ground = populate(item, token)
+        if not VAR_RE.search(ground):
+            return ground in self.facts and self._satisfy_conj(conj, i + 1, token)
+        pattern = compile_pattern(item)
+        cond = _Condition(self._alpha_for(pattern), pattern, set(token))
+        for toks in cond.index.get(cond.key(token), ()):
+            if self._satisfy_conj(conj, i + 1, cond.extend(token, toks)):
+                return True
+        return False
+
+    # -- firing ---------------------------------------------------------------
+
+    def run(self, limit: Optional[int] = None) -> int:
+        """Fire activations until the agenda is empty; returns how many fired."""
+        fired = 0
+        while self.agenda and (limit is None or fired < limit):
+            prod, token = self.agenda.popleft()
+            if any(self._satisfiable(neg.x, token) for neg in prod.negs):
+                continue
+            fired += 1
+            for template in prod.consequents:
+                self.add_fact(populate(template, token))
+        return fired
+
+
+def _patterns_in(expr: Any) -> List[str]:
+    if isinstance(expr, str):
+        return [expr]
+    if isinstance(expr, NOT):
+        return _patterns_in(expr.x)
+    return [p for x in expr for p in _patterns_in(x)]
+
+
+def forward_chain(rules: List[Rule], facts: Iterable[str]) -> List[str]:
+    """
+    Apply `rules` to `facts` until nothing new can be derived.
+    Returns every known fact: the given ones first, then derived ones in the
+    order they were asserted.
+
+    NOT(...) conditions are tested against the facts known when the rule
+    fires; a fact derived later does not retract earlier conclusions.
+    """
+    net = ReteNetwork(rules)
+    for fact in facts:
+        net.add_fact(fact)
+    net.run()
+    return list(net.facts)
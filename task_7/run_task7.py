@@ -1,4 +1,5 @@
 from data import zookeeper_rules
+from goal_eval import evaluate_goal_tree
 from lab1 import backchain_to_goal_tree
 from production import AND, OR, NOT
 
@@ -29,6 +30,17 @@ def main():
     print("\nGOAL TREE:")
     print(pretty(tree))
 
+    facts = [
+        "opus has feathers",
+        "opus does not fly",
+        "opus swims",
+        "opus is black and white",
+    ]
+    print("\nFACTS:")
+    for fact in facts:
+        print("  " + fact)
+    print("\nRESULT:", evaluate_goal_tree(tree, facts))
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from datalog import DatalogEngine
+from kb_gen import person_name, write_kb
+from prolog_pool import PrologPool, run_once, solutions_goal
+
+# ---------------------------------------------------------------------------
+# BENCHMARK HARNESS
+#    For each KB size: generate a synthetic KB (kb_gen.py), open every
+#    backend on it, and time `iterations` random goals per predicate.
+#    Reports p50/p95/p99 latency and throughput, and writes all results as
+#    JSON so runs can be diffed for regressions.
+#
+#      python bench.py --facts 1000 100000 1000000 --out bench_results.json
+# ---------------------------------------------------------------------------
+TASK9_KB_LOADER = Path(__file__).parent.parent / "task_9" / "kb_loader.py"
+
+# One goal template per predicate; {a} is a random person.
+PREDICATE_GOALS = {
+    "male": "male({a})",
+    "parent": "parent({a}, X)",
+    "spouse": "spouse({a}, X)",
+    "works_at": "works_at({a}, X)",
+    "mother": "mother(X, {a})",
+    "father": "father(X, {a})",
+    "grandparent": "grandparent(X, {a})",
+    "grandmother": "grandmother(X, {a})",
+    "ancestor": "ancestor(X, {a})",
+    "related": "related({a}, X)",
+}
+
+BACKENDS = ("datalog", "pool", "subprocess")
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, min(len(sorted_values), round(q / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+def summarise(latencies: list[float], errors: int, wall: float) -> dict:
+    ordered = sorted(latencies)
+    ms = lambda s: round(s * 1000, 3)
+    return {
+        "iterations": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p95_ms": ms(percentile(ordered, 95)),
+        "p99_ms": ms(percentile(ordered, 99)),
+        "mean_ms": ms(statistics.fmean(ordered)) if ordered else None,
+        "throughput_qps": round(len(latencies) / wall, 2) if wall > 0 else None,
+    }
+
+
+def open_backend(name: str, kb_path: Path, timeout: float) -> tuple[Callable[[str], object], Callable[[], None]]:
+    """Return (run_goal, close) for one backend over `kb_path`."""
+    if name == "datalog":
+        engine = DatalogEngine.from_file(kb_path)
+        return (lambda goal: list(engine.iter_query(goal))), (lambda: None)
+    if name == "pool":
+        pool = PrologPool(kb_path, size=1, timeout=timeout, startup_timeout=max(timeout, 300.0))
+        pool.run("true")  # start the worker (consults the KB) outside the timings
+        return (lambda goal: pool.run(solutions_goal(goal))), pool.close
+    if name == "subprocess":
+        return (lambda goal: run_once(kb_path, solutions_goal(goal), timeout)), (lambda: None)
+    raise ValueError(f"Unknown backend: {name!r}")
+
+
+def bench_backend(name: str, kb_path: Path, people: int, iterations: int,
+                  timeout: float, rng: random.Random) -> list[dict]:
+    start = time.perf_counter()
+    try:
+        run_goal, close = open_backend(name, kb_path, timeout)
+    except FileNotFoundError:
+        print(f"  {name:<10} skipped: swipl not found")
+        return []
+    load_s = round(time.perf_counter() - start, 3)
+
+    records = []
+    try:
+        for predicate, template in PREDICATE_GOALS.items():
+            goals = [template.format(a=person_name(rng.randrange(people))) for _ in range(iterations)]
+            latencies, errors = [], 0
+            wall_start = time.perf_counter()
+            for goal in goals:
+                t0 = time.perf_counter()
+                try:
+                    run_goal(goal)
+                except Exception:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - t0)
+            wall = time.perf_counter() - wall_start
+            records.append({"backend": name, "predicate": predicate, "load_s": load_s,
+                            **summarise(latencies, errors, wall)})
+    finally:
+        close()
+    return records
+
+
+def bench_kb_loader(kb_path: Path, iterations: int) -> list[dict]:
+    """Time task_9's kb_loader.load_kb_lines on the same KB."""
+    if not TASK9_KB_LOADER.exists():
+        return []
+    spec = importlib.util.spec_from_file_location("task9_kb_loader", str(TASK9_KB_LOADER))
+    if spec is None or spec.loader is None:
+        return []
+    mod = sys.modules.get(spec.name)
+    if mod is None:
+        mod = importlib.util.module_from_spec(spec)
+        # dataclasses looks the defining module up in sys.modules.
+        sys.modules[spec.name] = mod
+        try:
+            spec.loader.exec_module(mod)  # type: ignore
+        except BaseException:
+            del sys.modules[spec.name]
+            raise
+
+    latencies = []
+    wall_start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        mod.load_kb_lines(str(kb_path))
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - wall_start
+    return [{"backend": "task9_kb_loader", "predicate": "load_kb_lines", "load_s": 0.0,
+             **summarise(latencies, 0, wall)}]
+
+
+def print_table(records: list[dict]) -> None:
+    header = f"  {'facts':>9} {'backend':<16} {'predicate':<14} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'qps':>9} {'err':>4}"
+    print(header)
+    print("  " + "-" * (len(header) - 2))
+    for r in records:
+        print(f"  {r['facts']:>9} {r['backend']:<16} {r['predicate']:<14} "
+              f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['throughput_qps']!s:>9} {r['errors']:>4}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Prolog backends on synthetic KBs.")
+    parser.add_argument("--facts", type=int, nargs="+", default=[1_000, 100_000, 1_000_000],
+                        help="KB sizes to test, in facts")
+    parser.add_argument("--backends", nargs="+", default=["datalog", "pool"], choices=BACKENDS)
+    parser.add_argument("--iterations", type=int, default=50, help="Goals per predicate")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-goal timeout (seconds)")
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--branching", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--kb-dir", help="Keep generated KBs here instead of a temp dir")
+    parser.add_argument("--out", default="bench_results.json", help="JSON results file")
+    args = parser.parse_args()
+
+    kb_dir = Path(args.kb_dir) if args.kb_dir else Path(tempfile.mkdtemp(prefix="kb_bench_"))
+    kb_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(args.seed)
+
+    records = []
+    try:
+        for n_facts in args.facts:
+            kb_path = kb_dir / f"kb_{n_facts}.pl"
+            stats = write_kb(kb_path, facts=n_facts, depth=args.depth,
+                             branching=args.branching, seed=args.seed)
+            print(f"\nKB {kb_path.name}: {stats['people']} people, {stats['facts']} facts")
+            size_records = bench_kb_loader(kb_path, iterations=3)
+            for backend in args.backends:
+                size_records += bench_backend(backend, kb_path, stats["people"],
+                                              args.iterations, args.timeout, rng)
+            for r in size_records:
+                r.update(facts=stats["facts"], people=stats["people"])
+            print_table(size_records)
+            records += size_records
+    finally:
+        if not args.kb_dir:
+            shutil.rmtree(kb_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "depth": args.depth,
+            "branching": args.branching,
+            "seed": args.seed,
+        },
+        "results": records,
+    }
+    Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\n[saved] {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,29 @@
 from __future__ import annotations
 
+import asyncio
+import json
+import os
 import subprocess
-import re
+import tempfile
+import threading
+from itertools import islice
 from pathlib import Path
+from typing import Iterator
 
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 
+from datalog import DatalogEngine, DatalogError, parse_goal
+from goal_cache import GoalCache, format_bindings
+from llm_cache import ResponseCache, cached_chain
+from tracing import note_cache, span, trace_query
+from prolog_pool import (
+    SOLUTIONS_PROGRAM, PrologGoalError, PrologPool, PrologWorkerError, TabledKB,
+    _prolog_string, run_once, solutions_goal,
+)
+
 KB_PATH = Path(__file__).parent / "simpsons_kb.pl"
 
 # ---------------------------------------------------------------------------
@@ -17,6 +32,17 @@ KB_PATH = Path(__file__).parent / "simpsons_kb.pl"
 llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0)
 parser = StrOutputParser()
 
+# The chains run at temperature=0, so their answers are cached on disk and a
+# repeated (prompt, inputs) pair never reaches the API. LLM_CACHE=0 disables.
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE", "1") != "0"
+LLM_CACHE_TTL = float(os.environ["LLM_CACHE_TTL"]) if os.environ.get("LLM_CACHE_TTL") else None
+llm_cache = ResponseCache(ttl=LLM_CACHE_TTL) if LLM_CACHE_ENABLED else None
+LLM_KEY = f"{llm.model_name}:temperature={llm.temperature}"
+
+
+def _maybe_cached(chain, prompt):
+    return cached_chain(chain, prompt, LLM_KEY, llm_cache) if llm_cache is not None else chain
+
 # ---------------------------------------------------------------------------
 # 1. TRANSLATE CHAIN
 #    Input : {"query": str, "context": str}   (context = RAG snippets)
@@ -57,89 +83,317 @@ Query: {query}
 
 Prolog goal:""")
 
-translate_chain = TRANSLATE_PROMPT | llm | parser
+translate_chain = _maybe_cached(TRANSLATE_PROMPT | llm | parser, TRANSLATE_PROMPT)
 
 
 # ---------------------------------------------------------------------------
 # 2. PROLOG EXECUTOR
 #    Runs a Prolog goal against the KB using SWI-Prolog.
-#    Returns a dict: {"goal": str, "result": bool, "bindings": list[str]}
+#    Returns a dict: {"goal": str, "result": bool, "bindings": list[str],
+#                     "variables": list[str], "solutions": list[dict]}
+#    Every backend answers with the JSON lines of print_solutions/3 (see
+#    prolog_pool.SOLUTIONS_PROGRAM), one {variable: value} dict per solution.
+#
+#    Backends (PROLOG_BACKEND env var, or run_prolog(..., backend=...)):
+#      "pool"       - long-lived swipl workers with the KB pre-loaded (default)
+#      "subprocess" - one fresh swipl process per goal
+#      "datalog"    - in-process evaluator (datalog.py), no swipl needed
+#    The swipl backends table recursive predicates (PROLOG_TABLING).
 # ---------------------------------------------------------------------------
+PROLOG_BACKEND = os.environ.get("PROLOG_BACKEND", "pool")
+PROLOG_POOL_SIZE = int(os.environ.get("PROLOG_POOL_SIZE", "4"))
+PROLOG_TIMEOUT = 10
+# "auto" tables the KB's recursive predicates (ancestor/2, ...), "off"
+# disables tabling, or give indicators explicitly: "ancestor/2,related/2".
+_tabling = os.environ.get("PROLOG_TABLING", "auto")
+PROLOG_TABLING = _tabling if _tabling in ("auto", "off") else [p.strip() for p in _tabling.split(",") if p.strip()]
+
+SWIPL_NOT_FOUND = "ERROR: SWI-Prolog not found. Install it and make sure 'swipl' is on your PATH."
+SWIPL_TIMEOUT = "ERROR: SWI-Prolog timed out."
+
+# Results are memoised per (KB content, backend, normalised goal); set
+# PROLOG_CACHE=0 to disable, PROLOG_CACHE_DISK=1 to also keep them on disk.
+PROLOG_CACHE_ENABLED = os.environ.get("PROLOG_CACHE", "1") != "0"
+PROLOG_CACHE_DISK = os.environ.get("PROLOG_CACHE_DISK", "0") == "1"
+goal_cache = GoalCache(
+    KB_PATH,
+    disk=ResponseCache(Path(__file__).parent / ".prolog_cache.sqlite3") if PROLOG_CACHE_DISK else None,
+) if PROLOG_CACHE_ENABLED else None
+
+_pool: PrologPool | None = None
+_pool_lock = threading.Lock()
+_swipl_kb = TabledKB(KB_PATH, PROLOG_TABLING)
+_datalog: tuple[int, DatalogEngine] | None = None
+
+
+def get_pool() -> PrologPool:
+    """Return the shared worker pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PrologPool(KB_PATH, size=PROLOG_POOL_SIZE, timeout=PROLOG_TIMEOUT,
+                               tabling=PROLOG_TABLING)
+        return _pool
+
+
+def get_datalog_engine() -> DatalogEngine:
+    """Return the in-process engine for KB_PATH, re-parsing it if the file changed."""
+    global _datalog
+    mtime = KB_PATH.stat().st_mtime_ns
+    with _pool_lock:
+        if _datalog is None or _datalog[0] != mtime:
+            _datalog = (mtime, DatalogEngine.from_file(KB_PATH))
+        return _datalog[1]
+
+
+def _json_line(obj) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def _run_datalog(goal: str, offset: int = 0, limit: int | None = None) -> str:
+    """Answer `goal` in process, printing the same JSON lines swipl would."""
+    try:
+        _, variables = parse_goal(goal)
+        names = [v.name for v in variables if not v.name.startswith("_")]
+        if not names:
+            offset, limit = 0, 1  # a ground goal answers once, like once/1
+        stop = None if limit is None else offset + limit
+        solutions = islice(get_datalog_engine().iter_query(goal), offset, stop)
+        return "\n".join([_json_line({"vars": names})] + [_json_line(s) for s in solutions])
+    except DatalogError as e:
+        return f"ERROR: {e}"
+
+
+def _parse_solutions(raw: str) -> tuple[list[str] | None, list[dict]]:
+    """
+    Read print_solutions/3 output: the {"vars": [...]} header, then one dict
+    per solution. Non-JSON lines (warnings, output written by the KB) are
+    skipped. Returns (None, []) when there is no header, i.e. the goal errored.
+    """
+    variables = None
+    solutions = []
+    for line in raw.splitlines():
+        line = line.strip()
+        if not line.startswith("{"):
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            continue
+        if variables is None:
+            if isinstance(obj, dict) and "vars" in obj:
+                variables = obj["vars"]
+        else:
+            solutions.append(obj)
+    return variables, solutions
+
+
+def _solution_result(goal: str, raw: str) -> dict:
+    variables, solutions = _parse_solutions(raw)
+    if variables is None:
+        return _error_result(goal, raw or "ERROR: SWI-Prolog produced no output.")
+    return {
+        "goal": goal,
+        "result": len(solutions) > 0,
+        "bindings": format_bindings(variables, solutions),
+        "variables": variables,
+        "solutions": solutions,
+        "raw_output": raw,
+    }
+
 
-def run_prolog(goal: str) -> dict:
+def _error_result(goal: str, message: str) -> dict:
+    return {"goal": goal, "result": None, "bindings": [], "variables": [],
+            "solutions": [], "raw_output": message}
+
+
+def run_prolog(goal: str, backend: str | None = None,
+               limit: int | None = None, offset: int = 0) -> dict:
     """
     Execute `goal` against simpsons_kb.pl using SWI-Prolog.
-    Writes a temp .pl file and runs it — more reliable than stdin on Windows.
-    Returns {"goal", "result", "bindings", "raw_output"}.
+    `backend` overrides PROLOG_BACKEND ("pool", "subprocess" or "datalog").
+    `offset`/`limit` page through the solutions (limit=None: all of them).
+    Returns {"goal", "result", "bindings", "variables", "solutions", "raw_output"}.
     """
-    import tempfile
-    import os
-
     goal = goal.strip().rstrip(".")
+    backend = backend or PROLOG_BACKEND
+    cache_key = f"{backend}:{offset}:{limit}"
 
-    # Detect if goal contains an unbound variable (capital letter)
-    has_variable = bool(re.search(r'\b[A-Z_][A-Za-z_0-9]*\b', goal))
+    if goal_cache is not None:
+        cached = goal_cache.get(goal, cache_key)
+        note_cache(cached is not None)
+        if cached is not None:
+            return cached
 
-    if has_variable:
-        var_match = re.search(r'\b([A-Z][A-Za-z_0-9]*)\b', goal)
-        var_name = var_match.group(1) if var_match else "X"
-        prolog_script = (
-            f":- consult('{KB_PATH.as_posix()}').\n"
-            f":- forall({goal}, (write({var_name}), nl)), halt.\n"
-        )
+    try:
+        if backend == "pool":
+            raw = get_pool().run(solutions_goal(goal, offset, limit)).strip()
+        elif backend == "subprocess":
+            raw = run_once(_swipl_kb.path(), solutions_goal(goal, offset, limit), PROLOG_TIMEOUT)
+        elif backend == "datalog":
+            raw = _run_datalog(goal, offset, limit)
+        else:
+            raise ValueError(f"Unknown Prolog backend: {backend!r}")
+    except FileNotFoundError:
+        return _error_result(goal, SWIPL_NOT_FOUND)
+    except (subprocess.TimeoutExpired, TimeoutError):
+        return _error_result(goal, SWIPL_TIMEOUT)
+    except PrologWorkerError as e:
+        return _error_result(goal, f"ERROR: {e}")
+
+    out = _solution_result(goal, raw)
+    if goal_cache is not None:
+        goal_cache.put(goal, cache_key, out)
+    return out
+
+
+def iter_solutions(goal: str, limit: int | None = None,
+                   backend: str | None = None) -> Iterator[dict]:
+    """
+    Lazily yield one {variable: value} dict per solution of `goal` ({} once
+    for a true ground goal), as the backend produces them.
+
+    "pool" streams from a worker, which computes each solution only when the
+    next one is requested; "datalog" pulls from DatalogEngine.iter_query.
+    "subprocess" has no session to stream from and falls back to run_prolog.
+    Call .close() on the generator (or stop iterating inside a `with
+    contextlib.closing(...)`) to cancel the goal early. Raises
+    PrologGoalError / DatalogError if the goal is invalid or throws.
+    """
+    goal = goal.strip().rstrip(".")
+    backend = backend or PROLOG_BACKEND
+    if limit is not None and limit <= 0:
+        return
+
+    if backend == "datalog":
+        yield from islice(get_datalog_engine().iter_query(goal), limit)
+    elif backend == "pool":
+        frames = get_pool().stream(goal)
+        try:
+            next(frames)  # {"vars": [...]} header
+            yield from islice((json.loads(f) for f in frames), limit)
+        finally:
+            frames.close()
+    elif backend == "subprocess":
+        result = run_prolog(goal, backend=backend, limit=limit)
+        if result["result"] is None:
+            raise PrologGoalError(result["raw_output"])
+        yield from result["solutions"]
     else:
-        prolog_script = (
-            f":- consult('{KB_PATH.as_posix()}').\n"
-            f":- (({goal}) -> write(true) ; write(false)), nl, halt.\n"
+        raise ValueError(f"Unknown Prolog backend: {backend!r}")
+
+
+# ---------------------------------------------------------------------------
+# 2b. BATCH EXECUTOR
+#    Many goals in one swipl session: the KB is consulted once, each goal runs
+#    under its own call_with_time_limit/catch, and each answer comes back as
+#    one JSON line {"id", "status", "vars", "solutions"[, "error"]}.
+# ---------------------------------------------------------------------------
+BATCH_PROGRAM = r"""
+:- use_module(library(time)).
+:- set_stream(user_output, encoding(utf8)).
+:- consult('{kb_path}').
+{solutions_program}
+{goals}
+
+answer_batch_goal(Id, Text, TimeLimit, Offset, Limit) :-
+    catch(
+        (   parse_solutions_goal(Text, Goal, Bindings),
+            findall(Name, member(Name = _, Bindings), Names),
+            paged_goal(Goal, Bindings, Offset, Limit, Paged),
+            call_with_time_limit(TimeLimit,
+                findall(D, (Paged, solution_dict(Bindings, D)), Solutions)),
+            Dict = _{id: Id, status: "ok", vars: Names, solutions: Solutions}
+        ),
+        E,
+        (   E == time_limit_exceeded
+        ->  Dict = _{id: Id, status: "timeout"}
+        ;   format(string(Msg), "~q", [E]),
+            Dict = _{id: Id, status: "error", error: Msg}
         )
+    ),
+    write_json_line(Dict),
+    flush_output(user_output).
+
+main :-
+    forall(batch_goal(Id, Text),
+           answer_batch_goal(Id, Text, {time_limit}, {offset}, {limit})).
+
+:- initialization(main, main).
+"""
 
-    # Write to a temp file so Windows CMD handles it cleanly
-    tmp = tempfile.NamedTemporaryFile(
-        mode="w", suffix=".pl", delete=False, encoding="utf-8"
+
+def _batch_answer(goal: str, answer: dict | None) -> dict:
+    if answer is None:
+        return _error_result(goal, "ERROR: SWI-Prolog batch session ended before this goal.")
+    if answer["status"] == "timeout":
+        return _error_result(goal, SWIPL_TIMEOUT)
+    if answer["status"] == "error":
+        return _error_result(goal, f"ERROR: {answer['error']}")
+    raw = "\n".join([_json_line({"vars": answer["vars"]})] + [_json_line(s) for s in answer["solutions"]])
+    return _solution_result(goal, raw)
+
+
+def run_prolog_batch(goals: list[str], timeout: float = PROLOG_TIMEOUT,
+                     limit: int | None = None, offset: int = 0) -> list[dict]:
+    """
+    Run every goal in `goals` in one SWI-Prolog session, `timeout` seconds
+    each. Returns one run_prolog-style dict per goal, in order; a goal that
+    fails to parse, raises or times out does not affect the others.
+    `offset`/`limit` page through each goal's solutions.
+    """
+    goals = [g.strip().rstrip(".") for g in goals]
+    cache_key = f"batch:{offset}:{limit}"
+    results: list[dict | None] = [None] * len(goals)
+    if goal_cache is not None:
+        results = [goal_cache.get(g, cache_key) for g in goals]
+    todo = [i for i, r in enumerate(results) if r is None]
+    if not todo:
+        return results  # type: ignore[return-value]
+
+    facts = "\n".join(f"batch_goal({i}, {_prolog_string(goals[i])})." for i in todo)
+    # The goal text goes in last, so no later replace() can rewrite a
+    # placeholder-like string inside a goal (e.g. in a quoted atom).
+    program = (
+        BATCH_PROGRAM.replace("{time_limit}", repr(float(timeout)))
+        .replace("{offset}", str(offset))
+        .replace("{limit}", str(-1 if limit is None else limit))
+        .replace("{solutions_program}", SOLUTIONS_PROGRAM)
+        .replace("{kb_path}", _swipl_kb.path().as_posix())
+        .replace("{goals}", facts)
     )
+    tmp = tempfile.NamedTemporaryFile(mode="w", suffix=".pl", delete=False, encoding="utf-8")
     try:
-        tmp.write(prolog_script)
+        tmp.write(program)
         tmp.close()
-
         proc = subprocess.run(
             ["swipl", "-q", tmp.name],
             text=True,
+            encoding="utf-8",
             capture_output=True,
-            timeout=10,
+            timeout=timeout * len(todo) + PROLOG_TIMEOUT,
         )
-        raw = (proc.stdout + proc.stderr).strip()
     except FileNotFoundError:
-        return {
-            "goal": goal,
-            "result": None,
-            "bindings": [],
-            "raw_output": "ERROR: SWI-Prolog not found. Install it and make sure 'swipl' is on your PATH.",
-        }
+        return [r or _error_result(goals[i], SWIPL_NOT_FOUND) for i, r in enumerate(results)]
     except subprocess.TimeoutExpired:
-        return {
-            "goal": goal,
-            "result": None,
-            "bindings": [],
-            "raw_output": "ERROR: SWI-Prolog timed out.",
-        }
+        return [r or _error_result(goals[i], SWIPL_TIMEOUT) for i, r in enumerate(results)]
     finally:
         os.unlink(tmp.name)
 
-    lines = [l.strip() for l in raw.splitlines() if l.strip()]
+    answers = {}
+    for line in proc.stdout.splitlines():
+        try:
+            answer = json.loads(line)
+        except ValueError:
+            continue  # stray output from the KB or a goal
+        if isinstance(answer, dict) and "id" in answer:
+            answers[answer["id"]] = answer
 
-    if not has_variable:
-        result = "true" in raw.lower()
-        bindings = []
-    else:
-        result = len(lines) > 0
-        bindings = lines  # each line is one solution
-
-    return {
-        "goal": goal,
-        "result": result,
-        "bindings": bindings,
-        "raw_output": raw,
-    }
+    for i in todo:
+        results[i] = _batch_answer(goals[i], answers.get(i))
+        if goal_cache is not None:
+            goal_cache.put(goals[i], cache_key, results[i])
+    return results  # type: ignore[return-value]
 
 
 # ---------------------------------------------------------------------------
@@ -164,7 +418,7 @@ End with a one-line conclusion: "Therefore, [query] is TRUE." or "Therefore, [qu
 
 Trace:""")
 
-trace_chain = TRACE_PROMPT | llm | parser
+trace_chain = _maybe_cached(TRACE_PROMPT | llm | parser, TRACE_PROMPT)
 
 
 # ---------------------------------------------------------------------------
@@ -183,13 +437,30 @@ Respond with exactly:
   Reason: <one sentence>
 """)
 
-verify_chain = VERIFY_PROMPT | llm | parser
+verify_chain = _maybe_cached(VERIFY_PROMPT | llm | parser, VERIFY_PROMPT)
 
 
 # ---------------------------------------------------------------------------
 # FULL PIPELINE
 # ---------------------------------------------------------------------------
 
+def _format_context(rag_docs) -> str:
+    return "\n".join(
+        f"  [{d.metadata['type']}] {d.page_content}  (Prolog: {d.metadata.get('prolog','')})"
+        for d in rag_docs
+    )
+
+
+def _trace_inputs(query: str, prolog_result: dict, context: str) -> dict:
+    return {
+        "query": query,
+        "goal": prolog_result["goal"],
+        "result": prolog_result["result"],
+        "bindings": prolog_result["bindings"] if prolog_result["bindings"] else "none",
+        "context": context,
+    }
+
+
 def run_inference(query: str, retriever) -> dict:
     """
     Full Logic-LM pipeline:
@@ -198,30 +469,87 @@ def run_inference(query: str, retriever) -> dict:
     Returns a dict with all intermediate outputs for full transparency.
     """
 
-    # Step 1: Retrieve relevant KB context via RAG
-    rag_docs = retriever.invoke(query)
-    context = "\n".join(
-        f"  [{d.metadata['type']}] {d.page_content}  (Prolog: {d.metadata.get('prolog','')})"
-        for d in rag_docs
-    )
+    with trace_query(query) as timing:
+        # Step 1: Retrieve relevant KB context via RAG
+        with span("retrieve"):
+            rag_docs = retriever.invoke(query)
+        context = _format_context(rag_docs)
 
-    # Step 2: Translate NL query to Prolog goal
-    prolog_goal = translate_chain.invoke({"query": query, "context": context}).strip()
+        # Step 2: Translate NL query to Prolog goal
+        with span("translate", llm=True):
+            prolog_goal = translate_chain.invoke({"query": query, "context": context}).strip()
 
-    # Step 3: Execute Prolog goal
-    prolog_result = run_prolog(prolog_goal)
+        # Step 3: Execute Prolog goal
+        with span("prolog"):
+            prolog_result = run_prolog(prolog_goal)
 
-    # Step 4: Generate inference trace
-    trace = trace_chain.invoke({
+        # Step 4: Generate inference trace
+        with span("trace", llm=True):
+            trace = trace_chain.invoke(_trace_inputs(query, prolog_result, context))
+
+        # Step 5: Verify and produce final verdict
+        with span("verify", llm=True):
+            verdict = verify_chain.invoke({"query": query, "trace": trace})
+
+    return {
         "query": query,
-        "goal": prolog_result["goal"],
-        "result": prolog_result["result"],
-        "bindings": prolog_result["bindings"] if prolog_result["bindings"] else "none",
-        "context": context,
-    })
+        "rag_context": context,
+        "prolog_goal": prolog_goal,
+        "prolog_result": prolog_result,
+        "trace": trace,
+        "verdict": verdict,
+        "timings": timing.timings(),
+    }
+
+
+# ---------------------------------------------------------------------------
+# BATCH PIPELINE
+#    All queries are embedded in one call, then each query runs through
+#    translate -> prolog -> trace -> verify as its own asyncio task. At most
+#    `concurrency` LLM calls are in flight; Prolog runs in a worker thread
+#    outside that limit, so it overlaps with other queries' LLM calls.
+# ---------------------------------------------------------------------------
+
+def retrieve_batch(retriever, queries: list[str]) -> list[list]:
+    """
+    Retrieve documents for many queries. For a vector-store retriever the
+    queries are embedded together through embed_queries (CachedEmbeddings:
+    cached under the same keys as embed_query), or one embed_query call
+    each; anything else falls back to retriever.batch().
+    """
+    store = getattr(retriever, "vectorstore", None)
+    embeddings = getattr(store, "embeddings", None)
+    if embeddings is None or not hasattr(store, "similarity_search_by_vector"):
+        return retriever.batch(queries)
+    k = getattr(retriever, "search_kwargs", {}).get("k", 4)
+    if hasattr(embeddings, "embed_queries"):
+        vectors = embeddings.embed_queries(queries)
+    else:
+        vectors = [embeddings.embed_query(q) for q in queries]
+    return [store.similarity_search_by_vector(v, k=k) for v in vectors]
+
+
+async def _run_one(query: str, rag_docs, retriever, llm_slots: asyncio.Semaphore) -> dict:
+    with trace_query(query) as timing:
+        if rag_docs is None:
+            with span("retrieve"):
+                rag_docs = await retriever.ainvoke(query)
+        context = _format_context(rag_docs)
+
+        async with llm_slots:
+            with span("translate", llm=True):
+                prolog_goal = (await translate_chain.ainvoke({"query": query, "context": context})).strip()
 
-    # Step 5: Verify and produce final verdict
-    verdict = verify_chain.invoke({"query": query, "trace": trace})
+        with span("prolog"):
+            prolog_result = await asyncio.to_thread(run_prolog, prolog_goal)
+
+        async with llm_slots:
+            with span("trace", llm=True):
+                trace = await trace_chain.ainvoke(_trace_inputs(query, prolog_result, context))
+
+        async with llm_slots:
+            with span("verify", llm=True):
+                verdict = await verify_chain.ainvoke({"query": query, "trace": trace})
 
     return {
         "query": query,
@@ -230,4 +558,33 @@ def run_inference(query: str, retriever) -> dict:
         "prolog_result": prolog_result,
         "trace": trace,
         "verdict": verdict,
-    }
\ No newline at end of file
+        "timings": timing.timings(),
+    }
+
+
+async def arun_inference_batch(queries: list[str], retriever, concurrency: int = 4) -> list[dict]:
+    """
+    Async version of run_inference over many queries.
+    Results come back in query order. A query that fails yields
+    {"query": ..., "error": ...} instead of sinking the whole batch.
+    """
+    try:
+        with span("retrieve_batch", queries=len(queries)):
+            docs = await asyncio.to_thread(retrieve_batch, retriever, queries)
+    except Exception:
+        docs = [None] * len(queries)  # retrieve per query, isolating failures
+
+    llm_slots = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(
+        *(_run_one(q, d, retriever, llm_slots) for q, d in zip(queries, docs)),
+        return_exceptions=True,
+    )
+    return [
+        {"query": q, "error": f"{type(r).__name__}: {r}"} if isinstance(r, BaseException) else r
+        for q, r in zip(queries, results)
+    ]
+
+
+def run_inference_batch(queries: list[str], retriever, concurrency: int = 4) -> list[dict]:
+    """Blocking wrapper around arun_inference_batch."""
+    return asyncio.run(arun_inference_batch(queries, retriever, concurrency))
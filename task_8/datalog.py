@@ -0,0 +1,571 @@
+from __future__ import annotations
+
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+# ---------------------------------------------------------------------------
+# In-process Datalog engine for the Simpsons KBs.
+#
+# The KBs only use Horn clauses over atoms, so they can be evaluated without
+# SWI-Prolog:
+#   - facts are stored in `Relation`s with hash indexes on argument 1 and 2
+#   - recursive predicates (ancestor/2, ...) are materialised bottom-up with
+#     semi-naive evaluation
+#   - everything else is answered top-down. Body literals are joined
+#     most-bound first (see _order_body), so each one after the first is an
+#     index lookup whichever argument the caller bound
+#
+# Supported syntax: facts, rules with conjunctive bodies, `X \= Y`, `X = Y`,
+# quoted atoms and % / /* */ comments.
+# ---------------------------------------------------------------------------
+
+
+class DatalogError(ValueError):
+    """Raised for syntax errors and calls to unknown predicates."""
+
+
+class Var:
+    """A logic variable. Atoms are plain (interned) strings."""
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+    def __eq__(self, other):
+        return isinstance(other, Var) and other.name == self.name
+
+    def __hash__(self):
+        return hash(("Var", self.name))
+
+
+Term = object  # str (atom) or Var
+PredKey = Tuple[str, int]
+Env = Dict[Var, str]
+
+BUILTINS = {"\\=", "="}
+
+
+@dataclass(frozen=True)
+class Literal:
+    pred: str
+    args: Tuple[Term, ...]
+
+    @property
+    def key(self) -> PredKey:
+        return (self.pred, len(self.args))
+
+    def __repr__(self):
+        if self.pred in BUILTINS:
+            return f"{self.args[0]!r} {self.pred} {self.args[1]!r}"
+        return f"{self.pred}({', '.join(map(repr, self.args))})"
+
+
+@dataclass(frozen=True)
+class Clause:
+    head: Literal
+    body: Tuple[Literal, ...] = ()
+
+
+# ---------------------------------------------------------------------------
+# PARSER
+# ---------------------------------------------------------------------------
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+|%[^\n]*|/\*.*?\*/)
+  | (?P<neck>:-)
+  | (?P<neq>\\=)
+  | (?P<eq>=)
+  | (?P<quoted>'(?:[^'\\]|\\.|'')*')
+  | (?P<var>[A-Z_][A-Za-z0-9_]*)
+  | (?P<atom>[a-z][A-Za-z0-9_]*|\d+)
+  | (?P<punct>[(),.])
+""", re.VERBOSE | re.DOTALL)
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m:
+            line = text.count("\n", 0, pos) + 1
+            raise DatalogError(f"Syntax error at line {line}: {text[pos:pos + 20]!r}")
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == "ws":
+            continue
+        value = m.group(kind)
+        if kind == "quoted":
+            kind, value = "atom", value[1:-1].replace("''", "'").replace("\\'", "'")
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.pos = 0
+        self.vars: Dict[str, Var] = {}
+        self._anon = 0
+
+    def peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def expect(self, value: str) -> None:
+        tok = self.peek()
+        if tok is None or tok[1] != value:
+            raise DatalogError(f"Expected {value!r}, got {tok[1] if tok else 'end of input'!r}")
+        self.pos += 1
+
+    def term(self) -> Term:
+        tok = self.peek()
+        if tok is None:
+            raise DatalogError("Unexpected end of input")
+        self.pos += 1
+        kind, value = tok
+        if kind == "var":
+            if value == "_":
+                self._anon += 1
+                return Var(f"_G{self._anon}")
+            return self.vars.setdefault(value, Var(value))
+        if kind == "atom":
+            return sys.intern(value)
+        raise DatalogError(f"Expected a term, got {value!r}")
+
+    def literal(self) -> Literal:
+        first = self.term()
+        tok = self.peek()
+        if tok is not None and tok[0] in ("neq", "eq"):
+            self.pos += 1
+            return Literal(tok[1], (first, self.term()))
+        if isinstance(first, Var):
+            raise DatalogError(f"Variable {first!r} used as a goal")
+        args: List[Term] = []
+        if tok is not None and tok[1] == "(":
+            self.pos += 1
+            args.append(self.term())
+            while self.peek() is not None and self.peek()[1] == ",":
+                self.pos += 1
+                args.append(self.term())
+            self.expect(")")
+        return Literal(first, tuple(args))
+
+    def body(self) -> Tuple[Literal, ...]:
+        lits = [self.literal()]
+        while self.peek() is not None and self.peek()[1] == ",":
+            self.pos += 1
+            lits.append(self.literal())
+        return tuple(lits)
+
+    def clauses(self) -> List[Clause]:
+        out = []
+        while self.peek() is not None:
+            self.vars = {}
+            head = self.literal()
+            body: Tuple[Literal, ...] = ()
+            if self.peek() is not None and self.peek()[0] == "neck":
+                self.pos += 1
+                body = self.body()
+            self.expect(".")
+            out.append(Clause(head, body))
+        return out
+
+
+def parse_program(text: str) -> List[Clause]:
+    """Parse KB source text into a list of clauses."""
+    return _Parser(text).clauses()
+
+
+def parse_goal(text: str) -> Tuple[Tuple[Literal, ...], List[Var]]:
+    """
+    Parse a goal such as "parent(X, bart), male(X)".
+    Returns (literals, variables in order of first appearance).
+    """
+    p = _Parser(text.strip().rstrip("."))
+    lits = p.body()
+    if p.peek() is not None:
+        raise DatalogError(f"Unexpected {p.peek()[1]!r} in goal")
+    return lits, list(p.vars.values())
+
+
+# ---------------------------------------------------------------------------
+# RELATIONS
+# ---------------------------------------------------------------------------
+class Relation:
+    """A set of ground tuples with hash indexes on the first two arguments."""
+    __slots__ = ("arity", "tuples", "_set", "_index0", "_index1")
+
+    def __init__(self, arity: int):
+        self.arity = arity
+        self.tuples: List[Tuple[str, ...]] = []
+        self._set: Set[Tuple[str, ...]] = set()
+        self._index0: Dict[str, List[Tuple[str, ...]]] = {}
+        self._index1: Dict[str, List[Tuple[str, ...]]] = {}
+
+    def __len__(self):
+        return len(self.tuples)
+
+    def __contains__(self, tup):
+        return tup in self._set
+
+    def add(self, tup: Tuple[str, ...]) -> bool:
+        if tup in self._set:
+            return False
+        self._set.add(tup)
+        self.tuples.append(tup)
+        if self.arity >= 1:
+            self._index0.setdefault(tup[0], []).append(tup)
+        if self.arity >= 2:
+            self._index1.setdefault(tup[1], []).append(tup)
+        return True
+
+    def lookup(self, pattern: Tuple[Optional[str], ...]) -> List[Tuple[str, ...]]:
+        """Return tuples matching `pattern`, where None means "any value"."""
+        if None not in pattern:
+            return [pattern] if pattern in self._set else []
+        if self.arity >= 1 and pattern[0] is not None:
+            candidates = self._index0.get(pattern[0], ())
+        elif self.arity >= 2 and pattern[1] is not None:
+            candidates = self._index1.get(pattern[1], ())
+        else:
+            candidates = self.tuples
+        if self.arity <= 2:
+            return list(candidates)
+        return [t for t in candidates
+                if all(p is None or p == v for p, v in zip(pattern, t))]
+
+
+# ---------------------------------------------------------------------------
+# EVALUATION HELPERS
+# ---------------------------------------------------------------------------
+def _walk(term: Term, env: Env) -> Term:
+    return env.get(term, term) if isinstance(term, Var) else term
+
+
+def _match_tuple(args: Tuple[Term, ...], tup: Tuple[str, ...], env: Env) -> Optional[Env]:
+    """Extend `env` so that `args` equals the ground tuple `tup`."""
+    new = env
+    for a, v in zip(args, tup):
+        a = _walk(a, new)
+        if isinstance(a, Var):
+            if new is env:
+                new = dict(env)
+            new[a] = v
+        elif a != v:
+            return None
+    return new
+
+
+def _builtin(lit: Literal, env: Env) -> Optional[Env]:
+    left, right = (_walk(a, env) for a in lit.args)
+    if lit.pred == "\\=":
+        # Succeeds only when the two sides cannot unify: with atoms, when both
+        # are bound and different (an unbound side always unifies).
+        if isinstance(left, Var) or isinstance(right, Var):
+            return None
+        return env if left != right else None
+    # "="
+    if isinstance(left, Var) and isinstance(right, Var):
+        if left == right:
+            return env
+        raise DatalogError(f"Cannot unify two unbound variables in {lit!r}")
+    if isinstance(left, Var):
+        return {**env, left: right}
+    if isinstance(right, Var):
+        return {**env, right: left}
+    return env if left == right else None
+
+
+def _order_body(body: Tuple[Literal, ...], bound: Set[Var]) -> Tuple[Literal, ...]:
+    """
+    Greedy join order for `body` when the variables in `bound` are known:
+    a builtin as soon as it can run, otherwise the literal with the most
+    bound arguments (ties keep source order). `grandparent(X, bart)` thus
+    starts from parent(P, bart) via the second-argument index instead of
+    scanning parent/2.
+    """
+    bound = set(bound)
+    rest = list(body)
+    out: List[Literal] = []
+    while rest:
+        best, best_score = None, -1
+        for j, lit in enumerate(rest):
+            n = sum(1 for a in lit.args if not isinstance(a, Var) or a in bound)
+            if lit.pred in BUILTINS:
+                if n == len(lit.args) or (lit.pred == "=" and n):
+                    best = j
+                    break
+                continue
+            if n > best_score:
+                best, best_score = j, n
+        if best is None:  # only builtins that cannot run yet
+            out.extend(rest)
+            break
+        lit = rest.pop(best)
+        out.append(lit)
+        bound.update(a for a in lit.args if isinstance(a, Var))
+    return tuple(out)
+
+
+def _strongly_connected(graph: Dict[PredKey, Set[PredKey]]) -> List[List[PredKey]]:
+    """Tarjan's algorithm; components come out dependencies-first."""
+    index: Dict[PredKey, int] = {}
+    low: Dict[PredKey, int] = {}
+    stack: List[PredKey] = []
+    on_stack: Set[PredKey] = set()
+    out: List[List[PredKey]] = []
+
+    def visit(v: PredKey) -> None:
+        index[v] = low[v] = len(index)
+        stack.append(v)
+        on_stack.add(v)
+        for w in graph.get(v, ()):
+            if w not in index:
+                visit(w)
+                low[v] = min(low[v], low[w])
+            elif w in on_stack:
+                low[v] = min(low[v], index[w])
+        if low[v] == index[v]:
+            comp = []
+            while True:
+                w = stack.pop()
+                on_stack.discard(w)
+                comp.append(w)
+                if w == v:
+                    break
+            out.append(comp)
+
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 10 * len(graph) + 100))
+    try:
+        for v in graph:
+            if v not in index:
+                visit(v)
+    finally:
+        sys.setrecursionlimit(limit)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# ENGINE
+# ---------------------------------------------------------------------------
+class DatalogEngine:
+    """
+    Evaluates a Horn-clause KB in process.
+
+    `solve()` answers goals top-down; recursive predicates are materialised
+    bottom-up (semi-naive) the first time they are called, then served from
+    their indexes. `materialize()` can do that eagerly for every predicate.
+    """
+
+    def __init__(self, clauses: List[Clause]):
+        self.relations: Dict[PredKey, Relation] = {}
+        self.rules: Dict[PredKey, List[Clause]] = {}
+        self.materialized: Set[PredKey] = set()
+        # (id(clause), which head arguments are bound) -> join order of its body
+        self._orders: Dict[Tuple[int, Tuple[bool, ...]], Tuple[Literal, ...]] = {}
+
+        for clause in clauses:
+            key = clause.head.key
+            if clause.body:
+                self.rules.setdefault(key, []).append(clause)
+                continue
+            if any(isinstance(a, Var) for a in clause.head.args):
+                raise DatalogError(f"Fact {clause.head!r} is not ground")
+            self._relation(key).add(clause.head.args)
+
+        self.graph: Dict[PredKey, Set[PredKey]] = {
+            key: {lit.key for c in cs for lit in c.body if lit.pred not in BUILTINS}
+            for key, cs in self.rules.items()
+        }
+        self.components = _strongly_connected(self.graph)
+        self.recursive: Set[PredKey] = set()
+        for comp in self.components:
+            if len(comp) > 1 or comp[0] in self.graph.get(comp[0], ()):
+                self.recursive.update(comp)
+
+    @classmethod
+    def from_text(cls, text: str) -> "DatalogEngine":
+        return cls(parse_program(text))
+
+    @classmethod
+    def from_file(cls, path) -> "DatalogEngine":
+        return cls.from_text(Path(path).read_text(encoding="utf-8"))
+
+    def _relation(self, key: PredKey) -> Relation:
+        rel = self.relations.get(key)
+        if rel is None:
+            rel = self.relations[key] = Relation(key[1])
+        return rel
+
+    def defined(self, key: PredKey) -> bool:
+        return key in self.relations or key in self.rules
+
+    # -- bottom-up ------------------------------------------------------------
+
+    def materialize(self, keys: Optional[List[PredKey]] = None) -> None:
+        """
+        Compute every IDB predicate in `keys` (default: all of them) and the
+        predicates they depend on, component by component, semi-naively.
+        """
+        wanted = set(self.rules) if keys is None else self._closure(keys)
+        for comp in self.components:
+            if comp[0] in self.materialized or not wanted.intersection(comp):
+                continue
+            self._seminaive(comp)
+            self.materialized.update(comp)
+
+    def _closure(self, keys: List[PredKey]) -> Set[PredKey]:
+        seen: Set[PredKey] = set()
+        todo = list(keys)
+        while todo:
+            key = todo.pop()
+            if key in seen:
+                continue
+            seen.add(key)
+            todo.extend(self.graph.get(key, ()))
+        return seen
+
+    def _seminaive(self, comp: List[PredKey]) -> None:
+        members = set(comp)
+        rules = [c for key in comp for c in self.rules.get(key, ())]
+
+        # Round 0: every rule against the current relations.
+        delta: Dict[PredKey, Relation] = {key: Relation(key[1]) for key in comp}
+        for clause in rules:
+            for env in self._join(clause.body, 0, {}, {}):
+                tup = tuple(_walk(a, env) for a in clause.head.args)
+                if tup not in self._relation(clause.head.key):
+                    delta[clause.head.key].add(tup)
+        for key, rel in delta.items():
+            for tup in rel.tuples:
+                self._relation(key).add(tup)
+
+        # Later rounds: at least one recursive literal must use last round's delta.
+        while any(len(rel) for rel in delta.values()):
+            new: Dict[PredKey, Relation] = {key: Relation(key[1]) for key in comp}
+            for clause in rules:
+                for i, lit in enumerate(clause.body):
+                    if lit.key not in members or not len(delta[lit.key]):
+                        continue
+                    for env in self._join(clause.body, 0, {}, {i: delta[lit.key]}):
+                        tup = tuple(_walk(a, env) for a in clause.head.args)
+                        if tup not in self._relation(clause.head.key):
+                            new[clause.head.key].add(tup)
+            for key, rel in new.items():
+                for tup in rel.tuples:
+                    self._relation(key).add(tup)
+            delta = new
+
+    def _join(self, body: Tuple[Literal, ...], i: int, env: Env,
+              overrides: Dict[int, Relation]) -> Iterator[Env]:
+        if i == len(body):
+            yield env
+            return
+        lit = body[i]
+        if lit.pred in BUILTINS:
+            env2 = _builtin(lit, env)
+            if env2 is not None:
+                yield from self._join(body, i + 1, env2, overrides)
+            return
+        rel = overrides[i] if i in overrides else self.relations.get(lit.key)
+        if rel is None:
+            return
+        pattern = tuple(None if isinstance(a, Var) else a
+                        for a in (_walk(a, env) for a in lit.args))
+        for tup in rel.lookup(pattern):
+            env2 = _match_tuple(lit.args, tup, env)
+            if env2 is not None:
+                yield from self._join(body, i + 1, env2, overrides)
+
+    # -- top-down -------------------------------------------------------------
+
+    def solve(self, goals: Tuple[Literal, ...], env: Optional[Env] = None) -> Iterator[Env]:
+        """Yield one environment per proof of the conjunction `goals`."""
+        env = env or {}
+        return self._solve(_order_body(goals, set(env)), 0, env)
+
+    def _solve(self, goals: Tuple[Literal, ...], i: int, env: Env) -> Iterator[Env]:
+        if i == len(goals):
+            yield env
+            return
+        lit = goals[i]
+        if lit.pred in BUILTINS:
+            env2 = _builtin(lit, env)
+            if env2 is not None:
+                yield from self._solve(goals, i + 1, env2)
+            return
+
+        key = lit.key
+        if not self.defined(key):
+            raise DatalogError(f"Unknown procedure: {key[0]}/{key[1]}")
+        if key in self.recursive and key not in self.materialized:
+            self.materialize([key])
+
+        args = tuple(_walk(a, env) for a in lit.args)
+
+        rel = self.relations.get(key)
+        if rel is not None:
+            pattern = tuple(None if isinstance(a, Var) else a for a in args)
+            for tup in rel.lookup(pattern):
+                env2 = _match_tuple(args, tup, env)
+                if env2 is not None:
+                    yield from self._solve(goals, i + 1, env2)
+        if key in self.materialized:
+            return  # rule consequences already live in the relation
+
+        for clause in self.rules.get(key, ()):
+            for answer in self._call_rule(clause, args):
+                env2 = _match_tuple(args, answer, env)
+                if env2 is not None:
+                    yield from self._solve(goals, i + 1, env2)
+
+    def _call_rule(self, clause: Clause, args: Tuple[Term, ...]) -> Iterator[Tuple[str, ...]]:
+        # Clause variables live in their own environment, so no renaming is needed.
+        local: Env = {}
+        for h, a in zip(clause.head.args, args):
+            if isinstance(a, Var):
+                continue
+            h = _walk(h, local)
+            if isinstance(h, Var):
+                local[h] = a
+            elif h != a:
+                return
+        mask = tuple(not isinstance(a, Var) for a in args)
+        order = self._orders.get((id(clause), mask))
+        if order is None:
+            order = self._orders[(id(clause), mask)] = _order_body(clause.body, set(local))
+        for env in self._solve(order, 0, local):
+            answer = tuple(_walk(h, env) for h in clause.head.args)
+            if any(isinstance(v, Var) for v in answer):
+                raise DatalogError(f"Rule for {clause.head!r} is not range-restricted")
+            yield answer
+
+    def iter_query(self, goal: str) -> Iterator[Dict[str, str]]:
+        """
+        Lazily yield one {variable: value} dict per distinct solution of a goal
+        string, in the order they are found ({} once for a true ground goal).
+        Variables whose names start with "_" are not reported.
+        """
+        lits, variables = parse_goal(goal)
+        named = [v for v in variables if not v.name.startswith("_")]
+        seen = set()
+        for env in self.solve(lits):
+            row = tuple(env.get(v) for v in named)
+            if row not in seen:
+                seen.add(row)
+                yield {v.name: env.get(v) for v in named}
+                if not named:
+                    return
+
+    def query(self, goal: str) -> List[Dict[str, str]]:
+        """
+        Answer a goal string. Returns one {variable: value} dict per distinct
+        solution, in the order they were found ([{}] for a true ground goal).
+        """
+        return list(self.iter_query(goal))
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from llm_cache import ResponseCache
+
+# Prolog tokens. A sign directly before a number stays part of it (-1 is a
+# number, - 1 the term -(1)), and symbol-char runs such as \= or =.. stay
+# whole, so goals Prolog reads differently never share a key.
+_TOKEN_RE = re.compile(
+    r"'(?:[^'\\]|\\.|'')*'"
+    r'|"(?:[^"\\]|\\.)*"'
+    r"|[A-Za-z_][A-Za-z0-9_]*"
+    r"|-?(?:0'(?:\\.|''|.)|0[xob][0-9a-fA-F]+|\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)"
+    r"|[#$&*+\-./:<=>?@^~\\]+"
+    r"|\S"
+)
+
+
+def _variable_names(goal: str) -> tuple:
+    """(canonical goal text, {variable: canonical name}) for `goal`."""
+    names: dict = {}
+    out = []
+    for tok in _TOKEN_RE.findall(goal.strip().rstrip(".")):
+        if tok != "_" and (tok[0].isupper() or tok[0] == "_"):
+            if tok not in names:
+                names[tok] = ("_V" if tok[0] == "_" else "V") + str(len(names))
+            tok = names[tok]
+        out.append(tok)
+    return " ".join(out), names
+
+
+def normalise_goal(goal: str) -> str:
+    """
+    Canonical spelling of a goal: tokens joined by single spaces and named
+    variables renamed by order of first appearance (V0, V1, ... and _V0 for
+    underscore-prefixed ones). `parent( X,bart )` and `parent(Who, bart)`
+    normalise to the same string. Quoted text is left untouched.
+    """
+    return _variable_names(goal)[0]
+
+
+def format_bindings(variables: list, solutions: list) -> list:
+    """One string per solution: the value for a single variable, else "X=a, Y=b"."""
+    if not variables:
+        return []
+    if len(variables) == 1:
+        return [s[variables[0]] for s in solutions]
+    return [", ".join(f"{v}={s[v]}" for v in variables) for s in solutions]
+
+
+def _rename(result: dict, names: dict) -> dict:
+    """Copy of `result` with its variables (and solution keys) renamed through `names`."""
+    out = copy.deepcopy(result)
+    out["variables"] = [names.get(v, v) for v in result["variables"]]
+    out["solutions"] = [{names.get(k, k): val for k, val in s.items()} for s in result["solutions"]]
+    return out
+
+
+class GoalCache:
+    """
+    Memoises run_prolog results per (KB content, backend, normalised goal).
+
+    Goals that differ only in variable names share an entry, so results are
+    stored under the canonical names (V0, V1, ...) and renamed back to the
+    caller's variables on the way out; bindings and raw_output are rebuilt
+    from the renamed solutions.
+
+    The KB is re-hashed only when its mtime or size changes; a new hash
+    empties the in-memory LRU. An optional `disk` ResponseCache is consulted
+    on memory misses, so results also survive restarts. Error results are
+    never stored.
+    """
+
+    def __init__(self, kb_path: Path, maxsize: int = 4096,
+                 disk: Optional[ResponseCache] = None):
+        self.kb_path = Path(kb_path)
+        self.maxsize = maxsize
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, dict]" = OrderedDict()
+        self._stat: Optional[tuple] = None
+        self._kb_hash = ""
+        self._lock = threading.Lock()
+
+    def kb_hash(self) -> str:
+        """Content hash of the KB, recomputed when its mtime or size changes."""
+        st = self.kb_path.stat()
+        stat = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if stat != self._stat:
+                digest = hashlib.sha256(self.kb_path.read_bytes()).hexdigest()
+                if digest != self._kb_hash:
+                    self._memory.clear()
+                self._stat, self._kb_hash = stat, digest
+            return self._kb_hash
+
+    def key(self, goal: str, backend: str) -> str:
+        raw = f"v3\0{self.kb_hash()}\0{backend}\0{normalise_goal(goal)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, goal: str, backend: str) -> Optional[dict]:
+        """Cached result for `goal`, relabelled with the caller's goal text."""
+        key = self.key(goal, backend)
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+        if result is None and self.disk is not None:
+            stored = self.disk.get(key)
+            if stored is not None:
+                result = json.loads(stored)
+                self._remember(key, result)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        _, names = _variable_names(goal)
+        out = _rename(result, {canon: var for var, canon in names.items()})
+        out["goal"] = goal
+        out["bindings"] = format_bindings(out["variables"], out["solutions"])
+        out["raw_output"] = "\n".join(
+            json.dumps(line, separators=(",", ":"), ensure_ascii=False)
+            for line in [{"vars": out["variables"]}] + out["solutions"]
+        )
+        return out
+
+    def put(self, goal: str, backend: str, result: dict) -> None:
+        if result.get("result") is None or "ERROR" in result.get("raw_output", ""):
+            return
+        key = self.key(goal, backend)
+        _, names = _variable_names(goal)
+        stored = _rename(result, names)
+        stored.pop("bindings", None)  # bindings and raw_output are rebuilt by get()
+        stored.pop("raw_output", None)
+        self._remember(key, stored)
+        if self.disk is not None:
+            self.disk.put(key, json.dumps(stored))
+
+    def _remember(self, key: str, result: dict) -> None:
+        with self._lock:
+            self._memory[key] = result
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.misses = 0
+        if self.disk is not None:
+            self.disk.clear()
+
+
+if __name__ == "__main__":
+    # Regression check: goals that differ only in variable names share one
+    # entry, and a hit must answer in the caller's variables.
+    from datalog import DatalogEngine
+
+    kb = Path(__file__).parent / "simpsons_kb.pl"
+    engine = DatalogEngine.from_file(kb)
+
+    def fresh(goal: str) -> dict:
+        solutions = engine.query(goal)
+        variables = list(solutions[0]) if solutions else []
+        return {"goal": goal, "result": bool(solutions),
+                "bindings": format_bindings(variables, solutions),
+                "variables": variables, "solutions": solutions, "raw_output": ""}
+
+    cache = GoalCache(kb)
+    for first, renamed in [("parent(X, Y)", "parent(Y, X)"),         # swapped variables
+                           ("parent(homer, Kid)", "parent(homer, X)")]:  # renamed variable
+        cache.put(first, "datalog", fresh(first))
+        hit = cache.get(renamed, "datalog")
+        want = fresh(renamed)
+        assert hit is not None, renamed
+        for field in ("variables", "solutions", "bindings"):
+            assert hit[field] == want[field], (renamed, field, hit[field][:2], want[field][:2])
+    # Goals Prolog reads as different terms must not share a key.
+    for a, b in [("p(-1)", "p(- 1)"), ("X \\= Y", "X \\ = Y"), ("X =.. L", "X = . . L")]:
+        assert normalise_goal(a) != normalise_goal(b), (a, b)
+    assert normalise_goal("p( -1 )") == normalise_goal("p(-1)")
+    print("goal cache: renamed-variable hits OK")
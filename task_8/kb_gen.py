@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import argparse
+import random
+from collections import deque
+from pathlib import Path
+from typing import Iterator, Optional
+
+# ---------------------------------------------------------------------------
+# SYNTHETIC KB GENERATOR
+#    Writes Simpsons-schema knowledge bases of any size for benchmarking:
+#      male/1, female/1, parent/2, spouse/2, sibling/2, works_at/2
+#    followed by the rules of simpsons_kb.pl, so every predicate the real KB
+#    defines (mother, grandparent, ancestor, related, ...) works unchanged.
+#
+#    People are grouped into family trees. Each tree starts from a founding
+#    couple; every couple has 1..branching children, and children above the
+#    last generation marry someone from outside the tree. A new tree is
+#    started whenever one reaches `depth` generations.
+# ---------------------------------------------------------------------------
+KB_PATH = Path(__file__).parent / "simpsons_kb.pl"
+
+EMPLOYERS = [
+    "springfield_nuclear_plant",
+    "kwik_e_mart",
+    "moes_tavern",
+    "springfield_elementary",
+    "krusty_burger",
+    "leftorium",
+    "android_dungeon",
+    "springfield_dmv",
+]
+
+
+def kb_rules(kb_path: Path = KB_PATH) -> list[str]:
+    """The rule lines (those containing ':-') of an existing KB."""
+    return [
+        line.strip()
+        for line in kb_path.read_text(encoding="utf-8").splitlines()
+        if ":-" in line and not line.lstrip().startswith("%")
+    ]
+
+
+def person_name(i: int) -> str:
+    return f"p{i}"
+
+
+def generate_facts(people: Optional[int] = None, facts: Optional[int] = None,
+                   depth: int = 6, branching: int = 3, seed: int = 0) -> Iterator[str]:
+    """
+    Yield fact clauses until `people` people exist or `facts` facts have been
+    produced (whichever is given; at least one must be).
+    """
+    if people is None and facts is None:
+        raise ValueError("give people=, facts= or both")
+    if depth < 1 or branching < 1:
+        raise ValueError("depth and branching must be at least 1")
+    rng = random.Random(seed)
+    count = 0  # people so far
+    emitted = 0
+
+    def done() -> bool:
+        return (people is not None and count >= people) or (facts is not None and emitted >= facts)
+
+    def new_person(gender: str, adult: bool) -> tuple[str, list[str]]:
+        nonlocal count
+        name = person_name(count)
+        count += 1
+        out = [f"{gender}({name})."]
+        if adult and rng.random() < 0.7:
+            out.append(f"works_at({name}, {rng.choice(EMPLOYERS)}).")
+        return name, out
+
+    while not done():
+        a, out_a = new_person("male", adult=True)
+        b, out_b = new_person("female", adult=True)
+        for clause in out_a + out_b + [f"spouse({a}, {b}).", f"spouse({b}, {a})."]:
+            emitted += 1
+            yield clause
+        couples = deque([(a, b, 1)])
+
+        while couples and not done():
+            parent_a, parent_b, generation = couples.popleft()
+            kids = []
+            for _ in range(rng.randint(1, branching)):
+                if done():
+                    break
+                gender = rng.choice(("male", "female"))
+                adult = generation + 1 < depth
+                kid, clauses = new_person(gender, adult)
+                clauses += [f"parent({parent_a}, {kid}).", f"parent({parent_b}, {kid})."]
+                if kids:
+                    clauses.append(f"sibling({kids[-1]}, {kid}).")
+                kids.append(kid)
+                if adult:
+                    spouse, spouse_clauses = new_person(
+                        "female" if gender == "male" else "male", adult=True)
+                    clauses += spouse_clauses
+                    clauses += [f"spouse({kid}, {spouse}).", f"spouse({spouse}, {kid})."]
+                    couples.append((kid, spouse, generation + 1))
+                for clause in clauses:
+                    emitted += 1
+                    yield clause
+
+
+def write_kb(path: Path, people: Optional[int] = None, facts: Optional[int] = None,
+             depth: int = 6, branching: int = 3, seed: int = 0) -> dict:
+    """Write a synthetic KB to `path`; returns {"people", "facts", "rules"} counts."""
+    path = Path(path)
+    rules = kb_rules()
+    # Group clauses by predicate: SWI-Prolog wants each predicate's clauses
+    # contiguous, and datalog.py has no :- discontiguous directive.
+    by_predicate: dict[str, list[str]] = {}
+    for clause in generate_facts(people, facts, depth, branching, seed):
+        by_predicate.setdefault(clause[:clause.index("(")], []).append(clause)
+    n_facts = sum(len(v) for v in by_predicate.values())
+    n_people = len(by_predicate.get("male", ())) + len(by_predicate.get("female", ()))
+
+    with path.open("w", encoding="utf-8") as f:
+        f.write(f"% Synthetic Simpsons-schema KB: {n_people} people, {n_facts} facts\n")
+        f.write(f"% depth={depth}, branching={branching}, seed={seed}\n")
+        for name, clauses in by_predicate.items():
+            f.write(f"\n% --- {name} ({len(clauses)}) ---\n")
+            f.write("\n".join(clauses))
+            f.write("\n")
+        f.write("\n% Rules (from simpsons_kb.pl)\n")
+        for rule in rules:
+            f.write(rule + "\n")
+    return {"people": n_people, "facts": n_facts, "rules": len(rules)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Simpsons-schema KB.")
+    parser.add_argument("--out", required=True, help="Output .pl file")
+    parser.add_argument("--people", type=int, help="Stop after this many people")
+    parser.add_argument("--facts", type=int, help="Stop after this many facts")
+    parser.add_argument("--depth", type=int, default=6, help="Generations per family tree")
+    parser.add_argument("--branching", type=int, default=3, help="Max children per couple")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.people is None and args.facts is None:
+        parser.error("give --people and/or --facts")
+    stats = write_kb(Path(args.out), args.people, args.facts, args.depth, args.branching, args.seed)
+    print(f"Wrote {args.out}: {stats['people']} people, {stats['facts']} facts, {stats['rules']} rules")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from tracing import note_cache
+
+DEFAULT_CACHE_PATH = Path(__file__).parent / ".llm_cache.sqlite3"
+
+
+class ResponseCache:
+    """
+    Persistent string -> string cache in a SQLite file.
+
+    Entries older than `ttl` seconds are treated as misses (and purged on the
+    next write). Once the table holds more than `max_entries` rows the least
+    recently used ones are deleted.
+    """
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, ttl: Optional[float] = None,
+                 max_entries: int = 10_000):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Chains are invoked from asyncio.to_thread and the event loop alike.
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            if self.ttl is not None:
+                self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN"
+                    " (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return {"entries": count, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def _digest(*parts: str) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def cached_chain(chain: Runnable, prompt, model_key: str, cache: ResponseCache) -> Runnable:
+    """
+    Wrap a prompt | llm | parser chain so identical inputs are answered from
+    `cache`. The key covers `model_key`, the prompt template and the inputs,
+    so editing a prompt or switching model never serves a stale answer.
+    Only worth it for deterministic (temperature=0) models.
+    """
+    template_hash = _digest(prompt.pretty_repr())
+
+    def key_for(inputs: dict) -> str:
+        return _digest(model_key, template_hash, json.dumps(inputs, sort_keys=True, default=str))
+
+    def invoke(inputs: dict) -> str:
+        key = key_for(inputs)
+        out = cache.get(key)
+        note_cache(out is not None)
+        if out is None:
+            out = chain.invoke(inputs)
+            cache.put(key, out)
+        return out
+
+    async def ainvoke(inputs: dict) -> str:
+        key = key_for(inputs)
+        out = cache.get(key)
+        note_cache(out is not None)
+        if out is None:
+            out = await chain.ainvoke(inputs)
+            cache.put(key, out)
+        return out
+
+    return RunnableLambda(invoke, afunc=ainvoke)
@@ -4,7 +4,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from rag_store import build_retriever
-from chains import run_inference
+from chains import llm_cache, run_inference_batch
+from tracing import REGISTRY
 
 # ── Example queries
 QUERIES = [
@@ -23,6 +24,10 @@ def print_result(result: dict) -> None:
     print(f"  QUERY : {result['query']}")
     print(DIVIDER)
 
+    if "error" in result:
+        print(f"\n[ ERROR ]\n  {result['error']}\n")
+        return
+
     print("\n[ RAG CONTEXT — KB entries retrieved ]")
     for line in result["rag_context"].strip().splitlines():
         print(f"  {line}")
@@ -47,19 +52,45 @@ def print_result(result: dict) -> None:
     for line in result["verdict"].strip().splitlines():
         print(f"  {line}")
 
+    timings = result.get("timings", {})
+    if timings:
+        print(f"\n[ TIMINGS ]")
+        for stage, t in timings.items():
+            cache = f"  ({t['cache']})" if t.get("cache") else ""
+            print(f"  {stage:<10} {t['wall_ms']:>10.1f} ms{cache}")
+
     print()
 
 
+def print_timing_summary() -> None:
+    summary = REGISTRY.summary()
+    if not summary:
+        return
+    print(f"\n{DIVIDER}")
+    print("  STAGE TIMINGS")
+    print(DIVIDER)
+    print(f"  {'stage':<15} {'n':>4} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} "
+          f"{'cpu ms':>9} {'hit/miss':>9} {'tokens':>7}")
+    for stage, s in summary.items():
+        hits = f"{s['cache_hits']}/{s['cache_misses']}"
+        print(f"  {stage:<15} {s['count']:>4} {s['mean_ms']:>9.1f} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} "
+              f"{s['max_ms']:>9.1f} {s['cpu_ms']:>9.1f} {hits:>9} {s['tokens']:>7}")
+
+
 def main() -> None:
     print("Building RAG retriever from Simpsons KB...")
     retriever = build_retriever(k=5)
     print("Retriever ready.\n")
 
-    for query in QUERIES:
-        result = run_inference(query, retriever)
+    for result in run_inference_batch(QUERIES, retriever, concurrency=4):
         print_result(result)
 
+    print_timing_summary()
+
     print(f"\n{DIVIDER}")
+    if llm_cache is not None:
+        stats = llm_cache.stats()
+        print(f"  LLM cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
     print("  Done.")
     print(DIVIDER)
 
@@ -0,0 +1,581 @@
+from __future__ import annotations
+
+import atexit
+import collections
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from datalog import DatalogEngine, DatalogError
+
+# ---------------------------------------------------------------------------
+# SOLUTIONS PROGRAM
+#    Shared by every swipl-based backend. print_solutions(Text, Offset, Limit)
+#    parses the goal text itself (so quoted atoms are never mistaken for
+#    variables) and prints JSON lines:
+#        {"vars": ["X", "Y"]}            once, the goal's named variables
+#        {"X": "abe", "Y": "bart"}        one per solution
+#    A ground goal prints at most one {} (true). Limit < 0 means no limit.
+#    Variables whose names start with "_" are not reported.
+# ---------------------------------------------------------------------------
+SOLUTIONS_PROGRAM = r"""
+:- use_module(library(http/json)).
+:- use_module(library(solution_sequences)).
+
+reported_binding(Name = _) :-
+    \+ sub_atom(Name, 0, 1, _, '_').
+
+parse_solutions_goal(Text, Goal, Bindings) :-
+    term_string(Goal, Text, [variable_names(All)]),
+    include(reported_binding, All, Bindings).
+
+paged_goal(Goal, [], _, _, once(Goal)) :- !.
+paged_goal(Goal, _, Offset, Limit, Paged) :-
+    (   Limit < 0
+    ->  Paged = offset(Offset, Goal)
+    ;   Paged = limit(Limit, offset(Offset, Goal))
+    ).
+
+solution_dict(Bindings, Dict) :-
+    findall(Name-S, (member(Name = V, Bindings), format(string(S), "~w", [V])), Pairs),
+    dict_pairs(Dict, _, Pairs).
+
+write_json_line(Term) :-
+    json_write_dict(current_output, Term, [width(0)]),
+    nl.
+
+print_solutions(Text, Offset, Limit) :-
+    parse_solutions_goal(Text, Goal, Bindings),
+    findall(Name, member(Name = _, Bindings), Names),
+    write_json_line(_{vars: Names}),
+    paged_goal(Goal, Bindings, Offset, Limit, Paged),
+    forall(Paged, (solution_dict(Bindings, D), write_json_line(D))).
+"""
+
+# ---------------------------------------------------------------------------
+# WORKER PROGRAM
+#    Each worker consults the KB once, then loops reading requests from stdin:
+#        goal(Id, "goal text").
+#    and answers every request with one frame on stdout:
+#        FRAME <Id> <Length>\n<Length characters of captured output>
+#    Frame 0 ("ready") is sent once the KB has been consulted.
+#
+#    A streaming request
+#        stream(Id, "goal text").
+#    answers with a {"vars": [...]} frame, then one frame per solution. After
+#    each solution the worker blocks until it reads `next.` or `stop.`, so it
+#    never runs ahead of the reader. The stream ends with an "end" frame, or
+#    an "ERROR: ..." frame if the goal raised.
+#
+#    `{kb_path}` is the file from TabledKB.path(): the KB itself, or a small
+#    wrapper adding `:- table` directives before including it. reload_kb
+#    drops every table and consults it again.
+# ---------------------------------------------------------------------------
+WORKER_PROGRAM = r"""
+:- set_stream(user_output, encoding(utf8)).
+:- set_stream(user_output, newline(posix)).
+:- consult('{kb_path}').
+{solutions_program}
+
+reload_kb :-
+    abolish_all_tables,
+    consult('{kb_path}').
+
+send_frame(Id, Text) :-
+    string_length(Text, Len),
+    format(user_output, "FRAME ~w ~d~n~w", [Id, Len, Text]),
+    flush_output(user_output).
+
+run_request(Text, Out) :-
+    catch(
+        (   term_string(Goal, Text),
+            with_output_to(string(Out), (call(Goal) -> true ; true))
+        ),
+        E,
+        format(string(Out), "ERROR: ~q~n", [E])
+    ).
+
+send_json_frame(Id, Term) :-
+    with_output_to(string(S), write_json_line(Term)),
+    send_frame(Id, S).
+
+stream_solutions(Id, Text) :-
+    parse_solutions_goal(Text, Goal, Bindings),
+    findall(Name, member(Name = _, Bindings), Names),
+    send_json_frame(Id, _{vars: Names}),
+    paged_goal(Goal, Bindings, 0, -1, Paged),
+    open_null_stream(Null),
+    setup_call_cleanup(
+        set_output(Null),
+        (   Paged,
+            solution_dict(Bindings, D),
+            send_json_frame(Id, D),
+            read_term(user_input, Command, []),
+            Command \== next
+        ->  true
+        ;   true
+        ),
+        (   set_output(user_output),
+            close(Null)
+        )
+    ),
+    send_frame(Id, "end").
+
+run_stream(Id, Text) :-
+    catch(
+        stream_solutions(Id, Text),
+        E,
+        (   format(string(Msg), "ERROR: ~q", [E]),
+            send_frame(Id, Msg)
+        )
+    ).
+
+serve :-
+    read_term(user_input, Request, []),
+    (   Request == end_of_file
+    ->  true
+    ;   Request = goal(Id, Text)
+    ->  run_request(Text, Out),
+        send_frame(Id, Out),
+        serve
+    ;   Request = stream(Id, Text)
+    ->  run_stream(Id, Text),
+        serve
+    ;   serve
+    ).
+
+main :-
+    send_frame(0, "ready"),
+    serve.
+
+:- initialization(main, main).
+"""
+
+
+class PrologWorkerError(RuntimeError):
+    """Raised when a worker process dies or answers out of protocol."""
+
+
+class PrologGoalError(RuntimeError):
+    """Raised when a streamed goal throws a Prolog exception."""
+
+
+def tabled_predicates(kb_path: Path) -> list[str]:
+    """
+    Indicators ("ancestor/2", ...) of the KB's recursive predicates, found by
+    the dependency analysis in datalog.py. Returns [] if the KB uses syntax
+    that analysis does not understand.
+    """
+    try:
+        engine = DatalogEngine.from_file(kb_path)
+    except DatalogError:
+        return []
+    return sorted(f"{name}/{arity}" for name, arity in engine.recursive)
+
+
+class TabledKB:
+    """
+    The file swipl should consult for `kb_path`.
+
+    `tabling` is "auto" (table the recursive predicates), "off", or a list of
+    predicate indicators to table. Unless it is "off", `path()` is a
+    generated wrapper:
+        :- table ancestor/2.
+        :- include('/abs/path/simpsons_kb.pl').
+    The wrapper is regenerated, and `version` bumped, whenever the KB's
+    mtime or size changes.
+    """
+
+    def __init__(self, kb_path: Path, tabling="auto"):
+        self.kb_path = Path(kb_path).resolve()
+        self.tabling = tabling
+        self.tabled: list[str] = []
+        self.version = 0
+        self._stat: Optional[tuple] = None
+        self._wrapper: Optional[Path] = None
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def path(self) -> Path:
+        st = self.kb_path.stat()
+        stat = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if stat != self._stat:
+                self._rebuild()
+                self._stat = stat
+                self.version += 1
+            return self._wrapper or self.kb_path
+
+    def _rebuild(self) -> None:
+        if self.tabling == "off":
+            self.tabled = []
+            return
+        if self.tabling == "auto":
+            self.tabled = tabled_predicates(self.kb_path)
+        else:
+            self.tabled = list(self.tabling)
+        # The wrapper is kept even when nothing is tabled, so its path (which
+        # running workers re-consult) stays valid across KB edits.
+        if self._wrapper is None:
+            fd, name = tempfile.mkstemp(suffix=".pl")
+            os.close(fd)
+            self._wrapper = Path(name)
+        lines = [f":- table {p}." for p in self.tabled]
+        lines.append(f":- include('{self.kb_path.as_posix()}').")
+        self._wrapper.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    def close(self) -> None:
+        if self._wrapper is not None:
+            try:
+                os.unlink(self._wrapper)
+            except OSError:
+                pass
+            self._wrapper = None
+
+
+def _prolog_string(text: str) -> str:
+    """Quote `text` as a Prolog double-quoted string literal."""
+    escaped = (
+        text.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+    return f'"{escaped}"'
+
+
+def solutions_goal(goal: str, offset: int = 0, limit: Optional[int] = None) -> str:
+    """The goal actually sent to swipl: print_solutions/3 on the quoted goal text."""
+    return f"print_solutions({_prolog_string(goal)}, {offset}, {-1 if limit is None else limit})"
+
+
+def run_once(kb_file: Path, goal_text: str, timeout: float) -> str:
+    """
+    Run one goal (usually a solutions_goal) in a fresh swipl process that
+    consults `kb_file`, and return its stdout + stderr.
+    Writes a temp .pl file and runs it — more reliable than stdin on Windows.
+    """
+    prolog_script = (
+        f":- consult('{Path(kb_file).as_posix()}').\n"
+        f"{SOLUTIONS_PROGRAM}\n"
+        f":- catch({goal_text}, E, format(\"ERROR: ~q~n\", [E])), halt.\n"
+    )
+
+    # Write to a temp file so Windows CMD handles it cleanly
+    tmp = tempfile.NamedTemporaryFile(
+        mode="w", suffix=".pl", delete=False, encoding="utf-8"
+    )
+    try:
+        tmp.write(prolog_script)
+        tmp.close()
+
+        proc = subprocess.run(
+            ["swipl", "-q", tmp.name],
+            text=True,
+            encoding="utf-8",
+            capture_output=True,
+            timeout=timeout,
+        )
+        return (proc.stdout + proc.stderr).strip()
+    finally:
+        os.unlink(tmp.name)
+
+
+class PrologWorker:
+    """
+    One long-lived `swipl` process with the KB already consulted.
+    Requests are written to stdin; a reader thread turns stdout into frames.
+    """
+
+    def __init__(self, program_path: Path, startup_timeout: float = 30.0):
+        self.proc = subprocess.Popen(
+            ["swipl", "-q", str(program_path)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+        )
+        self._frames: queue.Queue = queue.Queue()
+        self._stderr: collections.deque = collections.deque(maxlen=50)
+        self._next_id = 0
+        self.kb_version = 0
+
+        threading.Thread(target=self._read_frames, daemon=True).start()
+        threading.Thread(target=self._drain_stderr, daemon=True).start()
+
+        try:
+            self._wait_for(0, startup_timeout)
+        except Exception:
+            self.kill()
+            raise
+
+    # -- background readers --------------------------------------------------
+
+    def _read_frames(self) -> None:
+        out = self.proc.stdout
+        while True:
+            header = out.readline()
+            if not header:
+                break
+            parts = header.split()
+            if len(parts) != 3 or parts[0] != "FRAME":
+                # Stray output (e.g. a goal that wrote to user_output directly)
+                continue
+            body = out.read(int(parts[2]))
+            self._frames.put((int(parts[1]), body))
+        self._frames.put(None)
+
+    def _drain_stderr(self) -> None:
+        for line in self.proc.stderr:
+            self._stderr.append(line.rstrip())
+
+    def _wait_for(self, request_id: int, timeout: float) -> str:
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"SWI-Prolog worker did not answer within {timeout}s")
+            try:
+                frame = self._frames.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError(f"SWI-Prolog worker did not answer within {timeout}s")
+            if frame is None:
+                detail = "\n".join(self._stderr)
+                raise PrologWorkerError(f"SWI-Prolog worker exited.\n{detail}".strip())
+            frame_id, body = frame
+            if frame_id == request_id:
+                return body
+            # Late answer to a request we already gave up on: drop it.
+
+    # -- public API -----------------------------------------------------------
+
+    def _send(self, line: str) -> None:
+        try:
+            self.proc.stdin.write(line + "\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise PrologWorkerError(f"SWI-Prolog worker pipe closed: {e}")
+
+    def request(self, goal_text: str, timeout: float) -> str:
+        """Run one goal and return everything it wrote to user_output."""
+        self._next_id += 1
+        request_id = self._next_id
+        self._send(f"goal({request_id}, {_prolog_string(goal_text)}).")
+        return self._wait_for(request_id, timeout)
+
+    def reload(self, timeout: float) -> None:
+        """Clear all tables and re-consult the KB."""
+        out = self.request("reload_kb", timeout)
+        if out.startswith("ERROR:"):
+            raise PrologWorkerError(f"SWI-Prolog worker could not reload the KB: {out.strip()}")
+
+    def open_stream(self, goal_text: str) -> int:
+        """Start a streaming request; read its frames with `_wait_for`."""
+        self._next_id += 1
+        request_id = self._next_id
+        self._send(f"stream({request_id}, {_prolog_string(goal_text)}).")
+        return request_id
+
+    def stream_command(self, command: str) -> None:
+        """Tell a paused stream to produce the `next` solution or `stop`."""
+        self._send(f"{command}.")
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def kill(self) -> None:
+        if self.alive():
+            self.proc.kill()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+    def close(self) -> None:
+        """Ask the worker to exit cleanly (EOF on stdin), killing it if it won't."""
+        if self.alive():
+            try:
+                self.proc.stdin.close()
+                self.proc.wait(timeout=2)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        self.kill()
+
+
+class PrologPool:
+    """
+    A fixed-size pool of `PrologWorker`s sharing one KB.
+
+    Workers are started lazily, up to `size`. A goal that exceeds its timeout
+    gets its worker killed; the slot is refilled by the next request, so a
+    stuck goal never takes the rest of the pool down with it.
+
+    Recursive predicates are tabled according to `tabling` (see TabledKB);
+    tables live as long as the worker. When the KB file changes, each worker
+    drops its tables and re-consults before serving its next request.
+    """
+
+    def __init__(self, kb_path: Path, size: int = 4, timeout: float = 10.0,
+                 startup_timeout: float = 30.0, tabling="auto"):
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+        self.kb_path = Path(kb_path)
+        self.kb = TabledKB(self.kb_path, tabling)
+        self.size = size
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+
+        # Idle workers; waiters on _cond re-check it and _started < size.
+        self._idle: List[PrologWorker] = []
+        self._cond = threading.Condition()
+        self._started = 0
+        self._closed = False
+
+        tmp = tempfile.NamedTemporaryFile(
+            mode="w", suffix=".pl", delete=False, encoding="utf-8"
+        )
+        tmp.write(
+            WORKER_PROGRAM.replace("{kb_path}", self.kb.path().as_posix())
+            .replace("{solutions_program}", SOLUTIONS_PROGRAM)
+        )
+        tmp.close()
+        self._program_path = Path(tmp.name)
+
+        atexit.register(self.close)
+
+    def _acquire(self) -> PrologWorker:
+        if self._closed:
+            raise PrologWorkerError("pool is closed")
+        self.kb.path()  # picks up KB edits
+        version = self.kb.version
+        worker = self._take()
+        if worker.kb_version != version:
+            try:
+                worker.reload(self.startup_timeout)
+            except BaseException:
+                self._discard(worker)
+                raise
+            worker.kb_version = version
+        return worker
+
+    def _take(self) -> PrologWorker:
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PrologWorkerError("pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._started < self.size:
+                    self._started += 1
+                    break
+                # Woken by _release, or by _discard freeing a slot to respawn.
+                self._cond.wait()
+        try:
+            worker = PrologWorker(self._program_path, self.startup_timeout)
+        except BaseException:
+            with self._cond:
+                self._started -= 1
+                self._cond.notify()
+            raise
+        worker.kb_version = self.kb.version
+        return worker
+
+    def _release(self, worker: PrologWorker) -> None:
+        with self._cond:
+            if worker.alive() and not self._closed:
+                self._idle.append(worker)
+                self._cond.notify()
+                return
+        self._discard(worker)
+
+    def _discard(self, worker: PrologWorker) -> None:
+        worker.kill()
+        with self._cond:
+            self._started -= 1
+            self._cond.notify()
+
+    def run(self, goal_text: str, timeout: Optional[float] = None) -> str:
+        """
+        Run `goal_text` on an idle worker and return its captured output.
+        Raises TimeoutError (worker replaced), PrologWorkerError, or
+        FileNotFoundError if `swipl` is not installed.
+        """
+        worker = self._acquire()
+        try:
+            out = worker.request(goal_text, self.timeout if timeout is None else timeout)
+        except BaseException:
+            self._discard(worker)
+            raise
+        self._release(worker)
+        return out
+
+    def stream(self, goal_text: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Yield the frames of a streaming request as the worker produces them:
+        the {"vars": ...} header, then one JSON solution per step.
+
+        The worker computes the next solution only when the caller asks for
+        it, so a slow consumer is never flooded. Closing the generator early
+        stops the goal and returns the worker to the pool. `timeout` bounds
+        the wait for each frame; on expiry the worker is replaced.
+        Raises PrologGoalError if the goal throws.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._acquire()
+        reusable = False
+        paused = False  # the worker has sent a solution and waits for next/stop
+        try:
+            request_id = worker.open_stream(goal_text)
+            header = True
+            while True:
+                frame = worker._wait_for(request_id, timeout)
+                if frame == "end":
+                    reusable = True
+                    return
+                if frame.startswith("ERROR:"):
+                    reusable = True
+                    raise PrologGoalError(frame[len("ERROR:"):].strip())
+                # The header is followed by the first solution without a command.
+                paused = not header
+                header = False
+                yield frame
+                if paused:
+                    worker.stream_command("next")
+                    paused = False
+        except GeneratorExit:
+            try:
+                if not paused:
+                    # Cancelled after the header: the first solution is on its way.
+                    frame = worker._wait_for(request_id, timeout)
+                    paused = frame != "end" and not frame.startswith("ERROR:")
+                if paused:
+                    worker.stream_command("stop")
+                    while worker._wait_for(request_id, timeout) != "end":
+                        pass
+                reusable = True
+            except (PrologWorkerError, TimeoutError):
+                pass
+            raise
+        finally:
+            if reusable:
+                self._release(worker)
+            else:
+                self._discard(worker)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for worker in idle:
+            worker.close()
+        try:
+            os.unlink(self._program_path)
+        except OSError:
+            pass
+        self.kb.close()
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import importlib.util
 import re
+import sys
 from pathlib import Path
 
 from langchain_community.vectorstores import Chroma
@@ -9,6 +11,28 @@ from langchain_core.documents import Document
 
 
 KB_PATH = Path(__file__).parent / "simpsons_kb.pl"
+# Both tasks share task_9's embedding cache module, and with it one cache
+# directory; it is loaded by path, as bench.py loads task_9's kb_loader.
+TASK9_EMBEDDING_CACHE = Path(__file__).parent.parent / "task_9" / "embedding_cache.py"
+
+
+def _load_embedding_cache():
+    spec = importlib.util.spec_from_file_location("task9_embedding_cache", str(TASK9_EMBEDDING_CACHE))
+    if spec is None or spec.loader is None:
+        raise ImportError(f"cannot load {TASK9_EMBEDDING_CACHE}")
+    mod = sys.modules.get(spec.name)
+    if mod is None:
+        mod = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = mod
+        try:
+            spec.loader.exec_module(mod)  # type: ignore
+        except BaseException:
+            del sys.modules[spec.name]
+            raise
+    return mod
+
+
+CachedEmbeddings = _load_embedding_cache().CachedEmbeddings
 
 # Human-readable descriptions for every fact/rule so embeddings are meaningful
 FACT_DESCRIPTIONS = {
@@ -81,7 +105,8 @@ def build_retriever(k: int = 4):
     and return a retriever that fetches the top-k most relevant entries.
     """
     docs = _parse_kb()
-    embeddings = OpenAIEmbeddings()
+    base = OpenAIEmbeddings()
+    embeddings = CachedEmbeddings(base, model_name=base.model)
 
     vectorstore = Chroma.from_documents(
         documents=docs,
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterator, Optional
+
+try:
+    from langchain_community.callbacks.manager import get_openai_callback
+except ImportError:  # token counts are simply left out
+    get_openai_callback = None
+
+# ---------------------------------------------------------------------------
+# TRACING
+#    span("translate") times one pipeline stage: wall time, CPU time of the
+#    calling thread, LLM token counts (llm=True) and whether a cache answered
+#    it (caches call note_cache). Spans opened inside trace_query(query) are
+#    collected into that query's Trace; when the query finishes its spans are
+#    added to REGISTRY (per-stage histograms) and appended as one JSON line
+#    to TRACE_FILE (env TRACE_FILE; empty disables the export).
+#
+#    CPU time is per thread: under asyncio it includes whatever else the
+#    event loop ran meanwhile, and it never includes the swipl process.
+# ---------------------------------------------------------------------------
+TRACE_FILE = os.environ.get("TRACE_FILE", str(Path(__file__).parent / "traces.jsonl"))
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    wall_ms: float = 0.0
+    cpu_ms: float = 0.0
+    cache: Optional[str] = None  # "hit" / "miss" / None (no cache involved)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    error: Optional[str] = None
+    attrs: dict = field(default_factory=dict)
+
+
+@dataclass
+class Trace:
+    query: str
+    spans: list = field(default_factory=list)
+
+    def timings(self) -> dict:
+        """{stage: {wall_ms, cpu_ms, cache, tokens}} plus a "total" entry."""
+        out = {}
+        for s in self.spans:
+            out[s.name] = {
+                "wall_ms": s.wall_ms,
+                "cpu_ms": s.cpu_ms,
+                "cache": s.cache,
+                "tokens": s.prompt_tokens + s.completion_tokens,
+            }
+        out["total"] = {
+            "wall_ms": round(sum(s.wall_ms for s in self.spans), 3),
+            "cpu_ms": round(sum(s.cpu_ms for s in self.spans), 3),
+            "tokens": sum(s.prompt_tokens + s.completion_tokens for s in self.spans),
+        }
+        return out
+
+
+def note_cache(hit: bool) -> None:
+    """Mark the current span as answered from (or missing) a cache."""
+    s = _current_span.get()
+    if s is not None:
+        # One miss anywhere means the stage did real work.
+        s.cache = "miss" if (not hit or s.cache == "miss") else "hit"
+
+
+@contextmanager
+def span(name: str, llm: bool = False, **attrs) -> Iterator[Span]:
+    s = Span(name, attrs=attrs)
+    token = _current_span.set(s)
+    wall0, cpu0 = time.perf_counter(), time.thread_time()
+    callback = get_openai_callback() if llm and get_openai_callback is not None else None
+    try:
+        if callback is not None:
+            with callback as cb:
+                yield s
+            s.prompt_tokens, s.completion_tokens = cb.prompt_tokens, cb.completion_tokens
+        else:
+            yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.wall_ms = round((time.perf_counter() - wall0) * 1000, 3)
+        s.cpu_ms = round((time.thread_time() - cpu0) * 1000, 3)
+        _current_span.reset(token)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append(s)
+        else:
+            REGISTRY.observe(s)
+
+
+@contextmanager
+def trace_query(query: str) -> Iterator[Trace]:
+    trace = Trace(query)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        for s in trace.spans:
+            REGISTRY.observe(s)
+        export(trace)
+
+
+_export_lock = threading.Lock()
+
+
+def export(trace: Trace) -> None:
+    if not TRACE_FILE:
+        return
+    line = json.dumps({"ts": time.time(), "query": trace.query,
+                       "spans": [asdict(s) for s in trace.spans]})
+    with _export_lock, open(TRACE_FILE, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+# ---------------------------------------------------------------------------
+# HISTOGRAMS
+# ---------------------------------------------------------------------------
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+              1_000, 2_500, 5_000, 10_000, 30_000, 60_000, float("inf"))
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; quantiles are bucket upper bounds."""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS_MS, self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class Registry:
+    """Per-stage wall-time histograms plus cache and token totals."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: dict = {}
+
+    def observe(self, s: Span) -> None:
+        with self._lock:
+            stage = self.stages.setdefault(
+                s.name, {"wall": Histogram(), "cpu_ms": 0.0, "hits": 0, "misses": 0,
+                         "tokens": 0, "errors": 0})
+            stage["wall"].observe(s.wall_ms)
+            stage["cpu_ms"] += s.cpu_ms
+            stage["hits"] += s.cache == "hit"
+            stage["misses"] += s.cache == "miss"
+            stage["tokens"] += s.prompt_tokens + s.completion_tokens
+            stage["errors"] += s.error is not None
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "count": st["wall"].count,
+                    "mean_ms": round(st["wall"].total / st["wall"].count, 3) if st["wall"].count else 0.0,
+                    "p50_ms": st["wall"].quantile(0.50),
+                    "p95_ms": st["wall"].quantile(0.95),
+                    "max_ms": st["wall"].max,
+                    "cpu_ms": round(st["cpu_ms"], 3),
+                    "cache_hits": st["hits"],
+                    "cache_misses": st["misses"],
+                    "tokens": st["tokens"],
+                    "errors": st["errors"],
+                }
+                for name, st in self.stages.items()
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self.stages.clear()
+
+
+REGISTRY = Registry()
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_CACHE_DIR = Path(__file__).parent / ".embedding_cache"
+FORMAT = 2
+TAG_BYTES = 16  # key digest stored in front of each vector
+MIN_GROW_SLOTS = 64
+
+
+def _tag(key: str) -> bytes:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=TAG_BYTES).digest()
+
+
+class EmbeddingCache:
+    """
+    Fixed-capacity on-disk store of float32 vectors.
+
+    Vectors live in a memory-mapped file of up to `capacity` slots of `dim`
+    floats; `index.json` maps each key to its slot. The file grows on demand
+    (doubling, from MIN_GROW_SLOTS slots), so a small KB uses little disk
+    whatever the capacity. When all `capacity` slots are taken the oldest
+    entry is evicted: least recently used ("lru") or first inserted
+    ("fifo"). Only the key -> slot index is held in memory.
+
+    maybe_flush() rewrites the index once `flush_every` new entries or
+    `flush_interval` seconds have piled up; close() always does. Each slot starts
+    with a digest of its key, so after a crash an index entry whose slot was
+    reused since the last flush reads as a miss rather than a wrong vector.
+    """
+
+    def __init__(self, path: Path, capacity: int = 50_000, eviction: str = "lru",
+                 flush_every: int = 1024, flush_interval: float = 30.0):
+        if eviction not in ("lru", "fifo"):
+            raise ValueError(f"Unknown eviction policy: {eviction!r}")
+        self.path = Path(path)
+        self.capacity = capacity
+        self.eviction = eviction
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.dim: Optional[int] = None
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free: List[int] = []
+        self._allocated = 0  # slots the data file holds
+        self._mm: Optional[mmap.mmap] = None
+        self._file = None
+        self._dirty = False
+        self._pending = 0  # puts since the last flush
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    @property
+    def _index_path(self) -> Path:
+        return self.path / "index.json"
+
+    @property
+    def _data_path(self) -> Path:
+        return self.path / "vectors.f32"
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._slots
+
+    def _load(self) -> None:
+        try:
+            meta = json.loads(self._index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if meta.get("format") != FORMAT or meta.get("capacity") != self.capacity \
+                or not self._data_path.exists():
+            return  # older layout, resized or incomplete: start empty
+        self._open(meta["dim"])
+        self._slots = OrderedDict((key, slot) for key, slot in meta["entries"]
+                                  if slot < self._allocated)
+        used = set(self._slots.values())
+        self._free = [s for s in range(self._allocated - 1, -1, -1) if s not in used]
+
+    def _open(self, dim: int) -> None:
+        self.dim = dim
+        mode = "r+b" if self._data_path.exists() else "w+b"
+        self._file = open(self._data_path, mode)
+        slots = min(os.fstat(self._file.fileno()).st_size // self._slot_size, self.capacity)
+        self._resize(slots)
+
+    def _resize(self, slots: int) -> None:
+        # The mapping is dropped first: Windows cannot resize a mapped file.
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        size = slots * self._slot_size
+        if os.fstat(self._file.fileno()).st_size != size:
+            self._file.truncate(size)
+        if size:
+            self._mm = mmap.mmap(self._file.fileno(), size)
+        # New slots are handed out in order, after the free ones already mapped.
+        self._free[:0] = range(slots - 1, self._allocated - 1, -1)
+        self._allocated = slots
+
+    @property
+    def _slot_size(self) -> int:
+        return TAG_BYTES + self.dim * 4
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                return None
+            offset = slot * self._slot_size
+            if self._mm[offset:offset + TAG_BYTES] != _tag(key):
+                # Slot reused after the last flush (crash before close): nobody
+                # else maps it, so it is free again.
+                del self._slots[key]
+                self._free.append(slot)
+                self._dirty = True
+                return None
+            if self.eviction == "lru":
+                self._slots.move_to_end(key)
+                self._dirty = True
+            vec = array("f")
+            vec.frombytes(self._mm[offset + TAG_BYTES:offset + self._slot_size])
+            return vec.tolist()
+
+    def put(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            if self.dim is None:
+                self._open(len(vector))
+            if len(vector) != self.dim:
+                raise ValueError(f"Vector has {len(vector)} dims, cache holds {self.dim}")
+            slot = self._slots.pop(key, None)
+            if slot is None:
+                if not self._free and self._allocated < self.capacity:
+                    self._resize(min(self.capacity, max(MIN_GROW_SLOTS, 2 * self._allocated)))
+                if not self._free:
+                    _, evicted = self._slots.popitem(last=False)
+                    self._free.append(evicted)
+                slot = self._free.pop()
+            self._slots[key] = slot
+            offset = slot * self._slot_size
+            self._mm[offset:offset + self._slot_size] = _tag(key) + array("f", vector).tobytes()
+            self._dirty = True
+            self._pending += 1
+
+    def maybe_flush(self) -> None:
+        """flush() once enough entries or time have piled up since the last one."""
+        if self._pending >= self.flush_every or \
+                (self._pending and time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the vectors and the index to disk."""
+        with self._lock:
+            if not self._dirty or self.dim is None:
+                return
+            if self._mm is not None:
+                self._mm.flush()
+            meta = {
+                "format": FORMAT,
+                "dim": self.dim,
+                "capacity": self.capacity,
+                "entries": list(self._slots.items()),
+            }
+            tmp = self._index_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(meta), encoding="utf-8")
+            os.replace(tmp, self._index_path)
+            self._dirty = False
+            self._pending = 0
+            self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+        if self._file is not None:
+            if self._mm is not None:
+                self._mm.close()
+            self._file.close()
+            self._file = None
+            self._mm = None
+
+
+class CachedEmbeddings:
+    """
+    Wraps any LangChain-style embedder (embed_documents / embed_query) with an
+    on-disk EmbeddingCache. Keys are the model name, model version, call kind
+    and text hash; only cache misses reach the model, in one batch per call.
+    """
+
+    def __init__(self, embeddings, model_name: str, model_version: str = "",
+                 cache_dir: Path = DEFAULT_CACHE_DIR, max_entries: int = 50_000,
+                 eviction: str = "lru"):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.model_version = model_version
+        slug = hashlib.sha256(f"{model_name}\0{model_version}".encode("utf-8")).hexdigest()[:16]
+        self.cache = EmbeddingCache(Path(cache_dir) / slug, capacity=max_entries, eviction=eviction)
+        self.hits = 0
+        self.misses = 0
+        atexit.register(self.cache.close)
+
+    def _key(self, kind: str, text: str) -> str:
+        raw = f"{self.model_name}\0{self.model_version}\0{kind}\0{text}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def _embed_many(self, kind: str, texts: List[str],
+                    embed: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        keys = [self._key(kind, t) for t in texts]
+        out: List[Optional[List[float]]] = [self.cache.get(k) for k in keys]
+
+        missing: Dict[str, List[int]] = {}
+        for i, vec in enumerate(out):
+            if vec is None:
+                missing.setdefault(texts[i], []).append(i)
+        self.hits += len(texts) - sum(len(v) for v in missing.values())
+        self.misses += len(missing)
+
+        if missing:
+            batch = list(missing)
+            for text, vec in zip(batch, embed(batch)):
+                vec = list(vec)
+                self.cache.put(keys[missing[text][0]], vec)
+                for i in missing[text]:
+                    out[i] = vec
+            self.cache.maybe_flush()
+        return out  # type: ignore[return-value]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_many("doc", texts, self.embeddings.embed_documents)
+
+    def embed_queries(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+        """
+        Many queries at once, cached under the same keys as embed_query. The
+        misses go to the model in one call when it offers embed_queries.
+        """
+        inner = getattr(self.embeddings, "embed_queries", None)
+        if inner is not None:
+            return self._embed_many("query", texts, lambda batch: inner(batch, batch_size=batch_size))
+        return self._embed_many("query", texts,
+                                lambda batch: [self.embeddings.embed_query(t) for t in batch])
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        vec = self.cache.get(key)
+        if vec is not None:
+            self.hits += 1
+            return vec
+        self.misses += 1
+        vec = list(self.embeddings.embed_query(text))
+        self.cache.put(key, vec)
+        self.cache.maybe_flush()
+        return vec
@@ -1,56 +1,145 @@
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, TypedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple, TypedDict
 
 from langgraph.graph import StateGraph, END
 
-from rag_store import retrieve_context
-from llm_judge import judge_relevance, infer_true_false
+from rag_store import CandidatePool, retrieve_candidates, retrieve_candidates_batch, retrieve_context
+from llm_judge import (RELEVANCE_THRESHOLD, calibrate_threshold, infer_true_false, judge_relevance,
+                       judge_relevance_scores)
 
 
 class GraphState(TypedDict, total=False):
     query: str
+    candidates: CandidatePool
     retrieved: List[str]
+    retrieved_idx: Any  # pool indices of `retrieved`
+    retrieved_scores: List[float]  # cosines to the vector that ranked them
     relevance: bool
     relevance_explanation: str
+    relevance_judge: str  # "vector" or "lexical"
     refine_round: int
+    refine_searches: int  # refine rounds that searched the store again
+    retrievals_saved: int
     final_answer: bool
     inference_trace: str
 
 
-def build_graph(vectordb) -> Any:
+TOP_K = 6
+REFINE_K = 8
+# First-pass over-fetch; refine rounds re-rank within it.
+POOL_K = 24
+MAX_CONCURRENCY = 4
+
+# "adaptive": refine only while the judge says the context is not relevant,
+#   for at most MAX_REFINE_ROUNDS rounds, re-ranking the first-pass pool.
+# "forced": always one refine round with a fresh search (the original demo).
+REFINE_MODE = os.environ.get("REFINE_MODE", "adaptive")
+MAX_REFINE_ROUNDS = int(os.environ.get("MAX_REFINE_ROUNDS", "1"))
+
+# "vector": judge_relevance_scores on the retrieval cosines (adaptive mode),
+#   scored against the vector that ranked the facts: the query, then the
+#   Rocchio-refined query, so a refine round can change the verdict.
+# "lexical": judge_relevance on token overlap.
+JUDGE = os.environ.get("RELEVANCE_JUDGE", "vector")
+
+# Labelled queries for fitting the vector judge's threshold (True when the
+# Simpsons KB holds the facts to answer them). Keep them apart from the
+# queries in tests.py, so the smoke run still checks the fitted threshold.
+CALIBRATION_QUERIES: List[Tuple[str, bool]] = [
+    ("Is marge married to homer?", True),
+    ("Does homer work at the nuclear plant?", True),
+    ("Is smithers the assistant of monty_burns?", True),
+    ("Is marge the mother of maggie?", True),
+    ("Is milhouse a friend of bart?", True),
+    ("Is krusty a comedian?", True),
+    ("Is bart mischievous?", True),
+    ("What is the capital of France?", False),
+    ("How do I bake sourdough bread?", False),
+    ("Which planet has the most moons?", False),
+    ("What is the boiling point of water in kelvin?", False),
+    ("Who wrote Hamlet?", False),
+    ("How fast does light travel?", False),
+]
+
+
+def _take(pool: CandidatePool, idx, vector: Optional[Any] = None) -> GraphState:
+    return {
+        "retrieved": [pool.texts[i] for i in idx],
+        "retrieved_idx": idx,
+        "retrieved_scores": pool.scores(idx, vector),
+    }
+
+
+def build_graph(vectordb, refine_mode: str = REFINE_MODE,
+                max_refine_rounds: int = MAX_REFINE_ROUNDS, pool_k: int = POOL_K,
+                relevance_threshold: float = RELEVANCE_THRESHOLD, judge: str = JUDGE) -> Any:
+    if refine_mode not in ("adaptive", "forced"):
+        raise ValueError(f"refine_mode must be 'adaptive' or 'forced', not {refine_mode!r}")
+    if judge not in ("vector", "lexical"):
+        raise ValueError(f"judge must be 'vector' or 'lexical', not {judge!r}")
     graph = StateGraph(GraphState)
 
     def retrieve_node(state: GraphState) -> GraphState:
         query = state["query"]
-        retrieved = retrieve_context(vectordb, query, k=6)
-        return {
-            **state,
-            "retrieved": retrieved,
-            "refine_round": state.get("refine_round", 0),
-        }
+        base = {**state, "refine_round": state.get("refine_round", 0),
+                "refine_searches": state.get("refine_searches", 0)}
+        if "retrieved" in state and "candidates" not in state:
+            return base  # context supplied by the caller
+        # run_graph_batch fetches the pools for all queries up front.
+        pool = state.get("candidates")
+        if pool is None or pool.k != pool_k:
+            pool = retrieve_candidates(vectordb, query, k=pool_k)
+        return {**base, "candidates": pool, **_take(pool, pool.top(pool.query_vector, TOP_K))}
 
     def judge_node(state: GraphState) -> GraphState:
-        is_rel, expl = judge_relevance(state["query"], state.get("retrieved", []))
-        return {**state, "relevance": is_rel, "relevance_explanation": expl}
+        scores = state.get("retrieved_scores")
+        if refine_mode == "adaptive" and judge == "vector" and scores is not None:
+            # Cosines from retrieval: no extra embedding or tokenising.
+            is_rel, expl = judge_relevance_scores(scores, relevance_threshold)
+            used = "vector"
+        else:
+            # Forced mode keeps the original judge throughout, as does context
+            # from a plain search (caller-supplied) that has no scores.
+            is_rel, expl = judge_relevance(state["query"], state.get("retrieved", []))
+            used = "lexical"
+        return {**state, "relevance": is_rel, "relevance_explanation": expl,
+                "relevance_judge": used}
 
     def refine_retrieve_node(state: GraphState) -> GraphState:
         """
-        Self-refinement: do an additional retrieval with a slightly expanded query.
+        Self-refinement. Adaptive mode re-ranks the first-pass pool around the
+        current results; forced mode (or a caller-supplied context) searches
+        again with a slightly expanded query.
         """
         round_num = state.get("refine_round", 0) + 1
+        pool = state.get("candidates")
+
+        if refine_mode == "adaptive" and pool is not None:
+            vector = pool.feedback(state.get("retrieved_idx", []))
+            idx = pool.top(vector, REFINE_K)
+            return {**state, **_take(pool, idx, vector), "refine_round": round_num}
+
         base_q = state["query"]
 
         # Simple expansion prompt
         expanded_q = base_q + " facts rules relationships"
 
-        retrieved = retrieve_context(vectordb, expanded_q, k=8)
-        return {**state, "retrieved": retrieved, "refine_round": round_num}
+        retrieved = retrieve_context(vectordb, expanded_q, k=REFINE_K)
+        return {**state, "retrieved": retrieved, "retrieved_idx": None,
+                "retrieved_scores": None, "refine_round": round_num,
+                "refine_searches": state.get("refine_searches", 0) + 1}
 
     def infer_node(state: GraphState) -> GraphState:
         ans, trace = infer_true_false(state["query"], state.get("retrieved", []))
-        return {**state, "final_answer": ans, "inference_trace": trace}
+        # Baseline: forced mode's one refine search. However many rounds ran,
+        # adaptive mode saved it unless a round had to search the store.
+        saved = 0
+        if refine_mode == "adaptive":
+            saved = max(0, 1 - state.get("refine_searches", 0))
+        return {**state, "final_answer": ans, "inference_trace": trace, "retrievals_saved": saved}
 
     graph.add_node("retrieve", retrieve_node)
     graph.add_node("judge", judge_node)
@@ -60,19 +149,13 @@ def build_graph(vectordb) -> Any:
     graph.set_entry_point("retrieve")
     graph.add_edge("retrieve", "judge")
 
-    # # Conditional: if relevance is false and refine_round < 1, refine; else infer
-    # def should_refine(state: GraphState) -> str:
-    #     if not state.get("relevance", False) and state.get("refine_round", 0) < 1:
-    #         return "refine_retrieve"
-    #     return "infer"
-
-
     def should_refine(state: GraphState) -> str:
-    # Force exactly ONE refinement pass for demo purposes
-        if state.get("refine_round", 0) < 1:
-            return "refine_retrieve"
-        return "infer"
-
+        if refine_mode == "forced":
+            # Exactly ONE refinement pass for demo purposes
+            return "refine_retrieve" if state.get("refine_round", 0) < 1 else "infer"
+        if state.get("relevance", False) or state.get("refine_round", 0) >= max_refine_rounds:
+            return "infer"
+        return "refine_retrieve"
 
     graph.add_conditional_edges(
         "judge",
@@ -86,4 +169,49 @@ def build_graph(vectordb) -> Any:
     graph.add_edge("refine_retrieve", "judge")
     graph.add_edge("infer", END)
 
-    return graph.compile()
\ No newline at end of file
+    return graph.compile()
+
+
+def _batch_inputs(vectordb, queries: Sequence[str], pool_k: int) -> List[GraphState]:
+    pools = retrieve_candidates_batch(vectordb, queries, k=pool_k)
+    return [{"query": q, "candidates": pool} for q, pool in zip(queries, pools)]
+
+
+def calibrate_relevance(vectordb, labelled: Sequence[Tuple[str, bool]] = CALIBRATION_QUERIES,
+                        k: int = TOP_K) -> float:
+    """
+    Relevance threshold for build_graph fitted to (query, relevant) pairs,
+    from the same first-pass retrieval scores judge_node sees. Costs one
+    batched retrieval for the labelled queries.
+    """
+    pools = retrieve_candidates_batch(vectordb, [q for q, _ in labelled], k=k)
+    means = []
+    for pool in pools:
+        scores = pool.scores(pool.top(pool.query_vector, k))
+        means.append(sum(scores) / len(scores) if scores else -1.0)
+    return calibrate_threshold(means, [label for _, label in labelled])
+
+
+def run_graph_batch(app, vectordb, queries: Sequence[str],
+                    max_concurrency: int = MAX_CONCURRENCY, pool_k: int = POOL_K) -> List[GraphState]:
+    """
+    Run `app` (from build_graph(vectordb)) over many queries. The first
+    retrieval is done for all queries together with retrieve_candidates_batch;
+    the graphs then run through app.batch, at most `max_concurrency` at a time.
+    Pass the `pool_k` given to build_graph; a pool of another size is
+    fetched again, per query, by the graph.
+    """
+    if not queries:
+        return []
+    return app.batch(_batch_inputs(vectordb, queries, pool_k),
+                     config={"max_concurrency": max_concurrency})
+
+
+async def arun_graph_batch(app, vectordb, queries: Sequence[str],
+                           max_concurrency: int = MAX_CONCURRENCY,
+                           pool_k: int = POOL_K) -> List[GraphState]:
+    """Async run_graph_batch, via app.abatch."""
+    if not queries:
+        return []
+    return await app.abatch(_batch_inputs(vectordb, queries, pool_k),
+                            config={"max_concurrency": max_concurrency})
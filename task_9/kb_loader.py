@@ -1,25 +1,228 @@
 from __future__ import annotations
 
+import re
+from dataclasses import dataclass
+from itertools import groupby
 from pathlib import Path
+from typing import Iterator, List, Optional, TextIO, Tuple
 
+CHUNK_SIZE = 1 << 16
 
-def load_kb_lines(kb_path: str) -> list[str]:
+# Things that change how the text after them is read. A full stop only ends
+# a clause when followed by layout or a comment, and not when it is part of
+# a symbol atom ("=..", "3.14" do not end a clause).
+_SPECIAL = re.compile(r"%|/\*|['\"`]|0'|(?<![-+*/\\^<>=~:.?@#&$])\.(?=[\s%])")
+_QUOTED = {
+    q: re.compile(rf"(?:[^{q}\\]|\\.|{q}{q})*{q}", re.S) for q in ("'", '"', "`")
+}
+_CHAR_CODE = re.compile(r"0'(?:\\.|''|.)", re.S)
+_WS = re.compile(r"\s+")
+_FUNCTOR = re.compile(r"'(?:[^'\\]|\\.|'')*'|[a-z][A-Za-z0-9_]*|[^\s(]+")
+
+
+@dataclass(frozen=True)
+class Clause:
+    """One complete clause of a .pl file."""
+    text: str       # whitespace outside quotes collapsed, comments removed
+    functor: str    # head functor ("" for directives)
+    arity: int
+    kind: str       # "fact", "rule" or "directive"
+    offset: int     # character offset of the clause in the file
+    line: int       # 1-based line the clause starts on
+
+
+def _top_level(text: str, seps: Tuple[str, ...]) -> Optional[Tuple[int, str]]:
+    """First (index, sep) of any of `seps` outside quotes, 0'c codes and brackets."""
+    tokens = re.compile(r"0'|['\"`([{)\]}]|" + "|".join(map(re.escape, seps)))
+    depth = 0
+    i = 0
+    while True:
+        m = tokens.search(text, i)
+        if m is None:
+            return None
+        c = m.group()
+        i = m.end()
+        if c == "0'":
+            i = _CHAR_CODE.match(text, m.start()).end()
+        elif c in _QUOTED:
+            q = _QUOTED[c].match(text, i)
+            i = q.end() if q else len(text)
+        elif c in "([{":
+            depth += 1
+        elif c in ")]}":
+            depth -= 1
+        elif depth == 0:
+            return m.start(), c
+
+
+def _head_info(text: str) -> Tuple[str, int, str]:
+    """(functor, arity, kind) of a clause's text."""
+    if text.startswith((":-", "?-")):
+        return "", 0, "directive"
+    neck = _top_level(text, (":-", "-->"))
+    head = (text[:neck[0]] if neck else text[:-1]).strip()
+    m = _FUNCTOR.match(head)
+    if m is None:
+        return "", 0, "rule" if neck else "fact"
+    functor = m.group()
+    arity = 0
+    args = head[m.end():]
+    if args.startswith("(") and args.endswith(")"):
+        inner = args[1:-1]
+        arity = 1
+        while True:
+            comma = _top_level(inner, (",",))
+            if comma is None:
+                break
+            arity += 1
+            inner = inner[comma[0] + 1:]
+    return functor, arity, "rule" if neck else "fact"
+
+
+class _ClauseScanner:
     """
-    Loads a .pl knowledge base and returns meaningful lines as text docs for RAG.
-    Keeps facts/rules and ignores blank lines and pure comments.
+    Reads a text stream chunk by chunk and yields Clauses. Only the current
+    chunk and the clause being assembled are held in memory.
+    """
+
+    def __init__(self, f: TextIO, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0          # scan position in buf
+        self.base = 0         # file offset of buf[0]
+        self.line_idx = 0     # index in buf up to which lines are counted
+        self.line = 1         # line number at buf[line_idx]
+        self.eof = False
+        self.parts: List[Tuple[str, bool]] = []  # (text, verbatim)
+        self.start: Optional[Tuple[int, int]] = None
+
+    # -- buffer ---------------------------------------------------------------
+
+    def _refill(self) -> None:
+        # Keep one consumed character: the full-stop pattern looks behind.
+        drop = self.pos - 1
+        if drop > 0:
+            if self.line_idx < drop:
+                self._line_at(drop)
+            self.buf = self.buf[drop:]
+            self.base += drop
+            self.line_idx -= drop
+            self.pos -= drop
+        chunk = self.f.read(self.chunk_size)
+        if chunk:
+            self.buf += chunk
+        else:
+            self.eof = True
+            self.buf += "\n"  # so a final "." is still followed by layout
+
+    def _line_at(self, index: int) -> int:
+        self.line += self.buf.count("\n", self.line_idx, index)
+        self.line_idx = index
+        return self.line
+
+    # -- clause assembly ------------------------------------------------------
+
+    def _mark_start(self, index: int) -> None:
+        if self.start is None:
+            self.start = (self.base + index, self._line_at(index))
+
+    def _text(self, end: int) -> None:
+        """Take buf[pos:end] as ordinary clause text."""
+        if end <= self.pos:
+            return
+        s = self.buf[self.pos:end]
+        if self.start is None:
+            k = len(s) - len(s.lstrip())
+            if k < len(s):
+                self._mark_start(self.pos + k)
+        self.parts.append((s, False))
+        self.pos = end
+
+    def _verbatim(self, end: int) -> None:
+        self._mark_start(self.pos)
+        self.parts.append((self.buf[self.pos:end], True))
+        self.pos = end
+
+    def _emit(self) -> Clause:
+        # Layout may be split over several parts, so collapse runs of plain text together.
+        text = "".join(
+            "".join(t for t, _ in group) if verbatim else _WS.sub(" ", "".join(t for t, _ in group))
+            for verbatim, group in groupby(self.parts, key=lambda p: p[1])
+        ).strip()
+        offset, line = self.start
+        self.parts = []
+        self.start = None
+        functor, arity, kind = _head_info(text)
+        return Clause(text, functor, arity, kind, offset, line)
+
+    # -- scanning -------------------------------------------------------------
+
+    def __iter__(self) -> Iterator[Clause]:
+        self._refill()
+        while True:
+            m = _SPECIAL.search(self.buf, self.pos)
+            # A token touching the end of the buffer may continue in the next chunk.
+            if m is None or (not self.eof and m.end() + 1 >= len(self.buf)):
+                safe = len(self.buf) if self.eof else max(self.pos, len(self.buf) - 2)
+                if m is not None:
+                    safe = min(safe, m.start())
+                self._text(safe)
+                if self.eof:
+                    break
+                self._refill()
+                continue
+
+            self._text(m.start())
+            tok = m.group()
+            if tok == "%":
+                end = self.buf.find("\n", m.end())
+            elif tok == "/*":
+                end = self.buf.find("*/", m.end())
+                end = end + 2 if end >= 0 else end
+            elif tok in _QUOTED:
+                q = _QUOTED[tok].match(self.buf, m.end())
+                # A closing quote at the very end might be the first of a doubled one.
+                end = q.end() if q and (self.eof or q.end() < len(self.buf)) else -1
+            elif tok == "0'":
+                c = _CHAR_CODE.match(self.buf, m.start())
+                end = c.end() if c and (self.eof or c.end() < len(self.buf)) else -1
+            else:  # end of clause
+                end = m.end()
+
+            if end < 0:
+                if self.eof:  # unterminated comment or quote: take the rest
+                    end = len(self.buf)
+                else:
+                    self._refill()
+                    continue
+
+            if tok in ("%", "/*"):
+                self.parts.append((" ", False))
+                self.pos = end
+            elif tok == ".":
+                self._verbatim(end)
+                yield self._emit()
+            else:
+                self._verbatim(end)
+        # Text after the last full stop is not a complete clause; it is dropped.
+
+
+def iter_clauses(kb_path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Clause]:
+    """
+    Stream the clauses of a .pl file one at a time, in constant memory.
+    Clauses may span several lines; comments are dropped.
     """
     path = Path(kb_path)
     if not path.exists():
         raise FileNotFoundError(f"KB file not found: {kb_path}")
+    with path.open(encoding="utf-8", newline="") as f:
+        yield from _ClauseScanner(f, chunk_size)
+
 
-    docs: list[str] = []
-    for raw in path.read_text(encoding="utf-8").splitlines():
-        line = raw.strip()
-        if not line:
-            continue
-        if line.startswith("%"):
-            continue
-        # Keep Prolog statements ending in '.'
-        if line.endswith("."):
-            docs.append(line)
-    return docs
\ No newline at end of file
+def load_kb_lines(kb_path: str) -> list[str]:
+    """
+    Loads a .pl knowledge base and returns one text doc per clause for RAG.
+    Multi-line rules are joined onto one line; comments are dropped.
+    """
+    return [clause.text for clause in iter_clauses(kb_path)]
@@ -1,7 +1,14 @@
 from __future__ import annotations
 
+import os
 import re
-from typing import Tuple
+from typing import Optional, Sequence, Tuple
+
+# Mean cosine similarity of query and retrieved facts above which the context
+# counts as relevant. The threshold depends on the embedding model and the
+# KB, so main.py fits it at startup with graph_app.calibrate_relevance; this
+# default only applies to build_graph callers that pass none.
+RELEVANCE_THRESHOLD = float(os.environ.get("RELEVANCE_THRESHOLD", "0.3"))
 
 
 def judge_relevance(query: str, retrieved: list[str]) -> Tuple[bool, str]:
@@ -24,6 +31,48 @@ def judge_relevance(query: str, retrieved: list[str]) -> Tuple[bool, str]:
     return False, f"Not relevant enough: token hits={hit} for tokens={sorted(list(q_tokens))[:10]}"
 
 
+def judge_relevance_scores(scores: Optional[Sequence[float]],
+                           threshold: float = RELEVANCE_THRESHOLD) -> Tuple[bool, str]:
+    """
+    Relevance from the cosine similarities retrieval already computed
+    between the (possibly refined) query and each retrieved fact (no
+    tokenising, no model call): relevant when their mean reaches `threshold`.
+    Returns (is_relevant, explanation).
+    """
+    if not scores:
+        return False, "Nothing retrieved."
+    mean = sum(scores) / len(scores)
+    if mean >= threshold:
+        return True, f"Relevant: mean cosine={mean:.3f} >= threshold={threshold:.3f}"
+    return False, f"Not relevant enough: mean cosine={mean:.3f} < threshold={threshold:.3f}"
+
+
+def calibrate_threshold(scores: Sequence[float], labels: Sequence[bool]) -> float:
+    """
+    Threshold for judge_relevance_scores that best separates labelled
+    queries: `scores` are each query's mean retrieval cosine, `labels`
+    whether its context really was relevant. Picks the midpoint between
+    neighbouring scores with the fewest misclassifications.
+    """
+    if len(scores) != len(labels):
+        raise ValueError(f"{len(scores)} scores but {len(labels)} labels")
+    if not scores:
+        return RELEVANCE_THRESHOLD
+    pairs = sorted(zip(scores, labels))
+    # Threshold below everything: every query judged relevant.
+    errors = sum(1 for _, rel in pairs if not rel)
+    best_errors, best_t = errors, pairs[0][0] - 1e-6
+    for i, (score, rel) in enumerate(pairs):
+        # Moving the threshold above `score` flips it to "not relevant".
+        errors += 1 if rel else -1
+        if i + 1 < len(pairs) and pairs[i + 1][0] == score:
+            continue
+        t = (score + pairs[i + 1][0]) / 2 if i + 1 < len(pairs) else score + 1e-6
+        if errors < best_errors:
+            best_errors, best_t = errors, t
+    return best_t
+
+
 def infer_true_false(query: str, retrieved: list[str]) -> Tuple[bool, str]:
     """
     Very simple inference for demo:
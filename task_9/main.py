@@ -2,27 +2,17 @@ from __future__ import annotations
 
 import argparse
 
-from kb_loader import load_kb_lines
-from rag_store import build_vectorstore
-from graph_app import build_graph
+from kb_loader import iter_clauses
+from rag_store import build_numpy_store, build_vectorstore
+from graph_app import JUDGE, MAX_REFINE_ROUNDS, REFINE_MODE, build_graph, calibrate_relevance, run_graph_batch
+from llm_judge import RELEVANCE_THRESHOLD
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--kb", default="simpsons_kb.pl")
-    parser.add_argument("--query", required=True)
-    args = parser.parse_args()
-
-    kb_lines = load_kb_lines(args.kb)
-    vectordb = build_vectorstore(kb_lines, persist_dir="chroma_db")
-
-    app = build_graph(vectordb)
-
-    result = app.invoke({"query": args.query})
-
+def print_result(result: dict) -> None:
     print("\n====== TASK 9 OUTPUT ======")
     print(f"Query: {result.get('query')}")
     print(f"Refine rounds: {result.get('refine_round')}")
+    print(f"Retrievals saved: {result.get('retrievals_saved', 0)}")
     print(f"Relevance: {result.get('relevance')}")
     print(f"Relevance explanation: {result.get('relevance_explanation')}\n")
 
@@ -36,5 +26,46 @@ def main():
     print(result.get("inference_trace"))
 
 
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--kb", default="simpsons_kb.pl")
+    parser.add_argument("--query", action="append", required=True,
+                        help="Repeat to answer several queries in one batch")
+    parser.add_argument("--backend", choices=["chroma", "numpy"], default="chroma",
+                        help="Vector store: persisted Chroma, or in-memory NumPy for small KBs")
+    parser.add_argument("--refine-mode", choices=["adaptive", "forced"], default=REFINE_MODE,
+                        help="adaptive: refine only when the context is judged irrelevant")
+    parser.add_argument("--max-refine-rounds", type=int, default=MAX_REFINE_ROUNDS)
+    parser.add_argument("--relevance-threshold", type=float, default=None,
+                        help="Mean cosine similarity the retrieved facts must reach "
+                             "(default: fitted at startup on graph_app.CALIBRATION_QUERIES)")
+    parser.add_argument("--judge", choices=["vector", "lexical"], default=JUDGE,
+                        help="vector: mean cosine of the retrieved facts to the query, or to "
+                             "the Rocchio-refined query after a refine round; "
+                             "lexical: token overlap with the query")
+    args = parser.parse_args()
+
+    clauses = iter_clauses(args.kb)
+    if args.backend == "numpy":
+        vectordb = build_numpy_store(clauses, persist_dir="numpy_db")
+    else:
+        vectordb = build_vectorstore(clauses, persist_dir="chroma_db")
+
+    threshold = args.relevance_threshold
+    if threshold is None:
+        if args.judge == "vector" and args.refine_mode == "adaptive":
+            threshold = calibrate_relevance(vectordb)
+            print(f"Calibrated relevance threshold: {threshold:.3f}")
+        else:
+            threshold = RELEVANCE_THRESHOLD  # not used by the lexical judge
+
+    app = build_graph(vectordb, refine_mode=args.refine_mode,
+                      max_refine_rounds=args.max_refine_rounds,
+                      relevance_threshold=threshold, judge=args.judge)
+
+    for result in run_graph_batch(app, vectordb, args.query):
+        print_result(result)
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
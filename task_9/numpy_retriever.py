@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+VECTORS_NAME = "vectors.npy"
+DOCS_NAME = "docs.json"
+
+
+def _normalise(m: np.ndarray) -> np.ndarray:
+    m = np.asarray(m, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices and scores of the k best columns of each row of `scores`, best first."""
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        empty = np.empty(scores.shape[:-1] + (0,))
+        return empty.astype(np.intp), empty.astype(np.float32)
+    if k < n:
+        idx = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        idx = np.broadcast_to(np.arange(n), scores.shape[:-1] + (n,))
+    top = np.take_along_axis(scores, idx, axis=-1)
+    order = np.argsort(-top, axis=-1, kind="stable")
+    return np.take_along_axis(idx, order, axis=-1), np.take_along_axis(top, order, axis=-1)
+
+
+class NumpyRetriever:
+    """
+    In-memory vector store: one contiguous, L2-normalised float32 matrix.
+
+    A query is one matrix-vector product plus an argpartition top-k; a batch
+    of queries is one matrix-matrix product. Offers the parts of the Chroma
+    interface this repo uses (similarity_search, similarity_search_by_vector,
+    as_retriever, embeddings), so it drops into retrieve_context unchanged.
+    """
+
+    def __init__(self, texts: Sequence[str], vectors: np.ndarray, embeddings,
+                 metadatas: Optional[Sequence[dict]] = None):
+        if len(texts) != len(vectors):
+            raise ValueError(f"{len(texts)} texts but {len(vectors)} vectors")
+        self.texts = list(texts)
+        self.metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        self.matrix = np.ascontiguousarray(_normalise(vectors)) if len(vectors) else \
+            np.zeros((0, 0), dtype=np.float32)
+        self._embeddings = embeddings
+
+    @classmethod
+    def from_texts(cls, texts: Sequence[str], embeddings,
+                   metadatas: Optional[Sequence[dict]] = None) -> "NumpyRetriever":
+        vectors = np.asarray(embeddings.embed_documents(list(texts)), dtype=np.float32)
+        return cls(texts, vectors, embeddings, metadatas)
+
+    @property
+    def embeddings(self):
+        return self._embeddings
+
+    def __len__(self):
+        return len(self.texts)
+
+    # -- persistence ----------------------------------------------------------
+
+    def save(self, path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / VECTORS_NAME, self.matrix)
+        (path / DOCS_NAME).write_text(
+            json.dumps({"texts": self.texts, "metadatas": self.metadatas}), encoding="utf-8"
+        )
+
+    @classmethod
+    def load(cls, path, embeddings, mmap: bool = True) -> "NumpyRetriever":
+        """Load a saved store; with `mmap` the matrix is paged in on demand."""
+        path = Path(path)
+        docs = json.loads((path / DOCS_NAME).read_text(encoding="utf-8"))
+        store = cls.__new__(cls)
+        store.texts = docs["texts"]
+        store.metadatas = docs["metadatas"]
+        store.matrix = np.load(path / VECTORS_NAME, mmap_mode="r" if mmap else None)
+        store._embeddings = embeddings
+        return store
+
+    # -- search ---------------------------------------------------------------
+
+    def search_vectors(self, queries: np.ndarray, k: int = 4) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k (indices, cosine scores) for one query vector (d,) or a batch
+        (m, d). Rows come back best first.
+        """
+        q = _normalise(queries)
+        if not len(self.texts):
+            return _top_k(np.zeros(q.shape[:-1] + (0,), dtype=np.float32), k)
+        return _top_k(q @ self.matrix.T, k)
+
+    def _documents(self, indices: np.ndarray) -> List[Document]:
+        return [Document(page_content=self.texts[i], metadata=self.metadatas[i]) for i in indices]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        idx, scores = self.search_vectors(np.asarray(self._embeddings.embed_query(query)), k)
+        return list(zip(self._documents(idx), scores.tolist()))
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        idx, _ = self.search_vectors(np.asarray(self._embeddings.embed_query(query)), k)
+        return self._documents(idx)
+
+    def similarity_search_by_vector(self, embedding: Sequence[float], k: int = 4,
+                                    **kwargs: Any) -> List[Document]:
+        idx, _ = self.search_vectors(np.asarray(embedding), k)
+        return self._documents(idx)
+
+    def batch_search(self, queries: Sequence[str], k: int = 4) -> List[List[Document]]:
+        """
+        Embed all queries (in one embed_queries call when the embedder has
+        it) and score them with one matmul.
+        """
+        if not queries:
+            return []
+        if hasattr(self._embeddings, "embed_queries"):
+            vectors = self._embeddings.embed_queries(list(queries))
+        else:
+            vectors = [self._embeddings.embed_query(q) for q in queries]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        idx, _ = self.search_vectors(vectors, k)
+        return [self._documents(row) for row in idx]
+
+    def as_retriever(self, k: int = 4, **kwargs: Any) -> "NumpyVectorRetriever":
+        search_kwargs = kwargs.get("search_kwargs", {"k": k})
+        return NumpyVectorRetriever(vectorstore=self, search_kwargs=search_kwargs)
+
+
+class NumpyVectorRetriever(BaseRetriever):
+    """LangChain retriever over a NumpyRetriever."""
+
+    vectorstore: Any
+    search_kwargs: dict = {"k": 4}
+
+    def _get_relevant_documents(self, query: str, *,
+                                run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.vectorstore.similarity_search(query, **self.search_kwargs)
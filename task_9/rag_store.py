@@ -1,21 +1,46 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import os
-from typing import List
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 from langchain_community.vectorstores import Chroma
-from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+import sentence_transformers
 from sentence_transformers import SentenceTransformer
 
+from embedding_cache import CachedEmbeddings
+from kb_loader import Clause
+from numpy_retriever import NumpyRetriever, _normalise, _top_k
+
+COLLECTION_NAME = "simpsons_kb"
+MANIFEST_NAME = "kb_manifest.json"
+CHUNK_SIZE = 300
+CHUNK_OVERLAP = 30
+ADD_BATCH_SIZE = int(os.environ.get("KB_ADD_BATCH_SIZE", "1024"))
+# Queries are short, so MiniLM keeps up with larger encode batches than its default 32.
+QUERY_BATCH_SIZE = 64
+
 
 class LocalSentenceTransformerEmbeddings:
     """
     Minimal embedding wrapper compatible with LangChain vector stores.
     Uses sentence-transformers locally (no API key).
+    The model is loaded on first use, so opening an existing store is free.
     """
     def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self._model: Optional[SentenceTransformer] = None
+
+    @property
+    def model(self) -> SentenceTransformer:
+        if self._model is None:
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         return self.model.encode(texts, normalize_embeddings=True).tolist()
@@ -23,27 +48,263 @@ class LocalSentenceTransformerEmbeddings:
     def embed_query(self, text: str) -> List[float]:
         return self.model.encode([text], normalize_embeddings=True)[0].tolist()
 
+    def embed_queries(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+        return self.model.encode(texts, batch_size=batch_size, normalize_embeddings=True).tolist()
 
-def build_vectorstore(kb_lines: list[str], persist_dir: str = "chroma_db") -> Chroma:
-    # Split not strictly necessary for short facts, but keeps it scalable.
-    splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=30)
-    docs = [Document(page_content=line) for line in kb_lines]
-    chunks = splitter.split_documents(docs)
 
-    embeddings = LocalSentenceTransformerEmbeddings()
+def build_embeddings(model_name: str = "all-MiniLM-L6-v2") -> CachedEmbeddings:
+    """Local embedder behind the on-disk embedding cache."""
+    return CachedEmbeddings(
+        LocalSentenceTransformerEmbeddings(model_name),
+        model_name=model_name,
+        model_version=sentence_transformers.__version__,
+    )
+
+
+def _content_id(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
-    # Clear old store if you want clean runs
-    os.makedirs(persist_dir, exist_ok=True)
 
-    vectordb = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
+def _load_manifest(persist_dir: str) -> Optional[dict]:
+    path = Path(persist_dir) / MANIFEST_NAME
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _save_manifest(persist_dir: str, manifest: dict) -> None:
+    path = Path(persist_dir) / MANIFEST_NAME
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _manifest(embeddings: CachedEmbeddings, wanted: Dict[str, Tuple[str, dict]]) -> dict:
+    ids = sorted(wanted)
+    return {"model": embeddings.model_name, "ids": ids,
+            "metadatas": {i: wanted[i][1] for i in ids}}
+
+
+def _open_store(embeddings: CachedEmbeddings, persist_dir: str) -> Chroma:
+    return Chroma(
+        collection_name=COLLECTION_NAME,
+        embedding_function=embeddings,
         persist_directory=persist_dir,
     )
-    vectordb.persist()
+
+
+def _chunks(kb: Iterable[Union[str, Clause]]) -> Dict[str, Tuple[str, dict]]:
+    """
+    (text, metadata) per chunk of the KB, keyed by content id. Most clauses
+    fit in one chunk and are used as they are; only clauses longer than
+    CHUNK_SIZE go through the text splitter. Clauses carry their functor,
+    arity, kind and line as metadata.
+    """
+    splitter = None
+    # Identical chunks share an id, so they are stored once.
+    wanted: Dict[str, Tuple[str, dict]] = {}
+    for item in kb:
+        if isinstance(item, Clause):
+            text = item.text
+            metadata = {"functor": item.functor, "arity": item.arity,
+                        "kind": item.kind, "line": item.line}
+        else:
+            text, metadata = item.strip(), {}
+        if not text:
+            continue
+        if len(text) <= CHUNK_SIZE:
+            wanted.setdefault(_content_id(text), (text, metadata))
+            continue
+        if splitter is None:
+            splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        for piece in splitter.split_text(text):
+            wanted.setdefault(_content_id(piece), (piece, metadata))
+    return wanted
+
+
+def _batches(ids: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def build_vectorstore(kb: Iterable[Union[str, Clause]], persist_dir: str = "chroma_db",
+                      batch_size: int = ADD_BATCH_SIZE) -> Chroma:
+    """
+    Build or update the persisted Chroma store for `kb`: KB lines, or
+    Clauses straight from kb_loader.iter_clauses.
+
+    Every chunk is stored under the SHA-256 of its text, and a manifest in
+    `persist_dir` records which ids the collection holds, with their
+    metadata. On each run only new chunks are embedded and chunks no longer
+    in the KB are deleted (an edited line is therefore a delete plus an
+    add); an unchanged chunk whose metadata changed (e.g. it moved to
+    another line) has its metadata updated in place, without re-embedding.
+    With an unchanged KB the existing collection is opened without computing
+    any embeddings. Chunks are deleted, updated and added `batch_size` at a
+    time, which bounds the size of each embedding call and stays under
+    Chroma's per-call batch limit.
+    """
+    wanted = _chunks(kb)
+    embeddings = build_embeddings()
+
+    os.makedirs(persist_dir, exist_ok=True)
+    vectordb = _open_store(embeddings, persist_dir)
+
+    manifest = _load_manifest(persist_dir)
+    if (
+        manifest is None
+        or manifest.get("model") != embeddings.model_name
+        or vectordb._collection.count() != len(manifest.get("ids", []))
+    ):
+        # Unknown contents (e.g. duplicates appended by older runs) or a
+        # different embedding model: start the collection over.
+        vectordb.delete_collection()
+        vectordb = _open_store(embeddings, persist_dir)
+        existing: set = set()
+        stored: dict = {}
+    else:
+        existing = set(manifest["ids"])
+        # Manifests from before metadata was recorded: refresh every chunk once.
+        stored = manifest.get("metadatas", {})
+
+    changed = [i for i in wanted if i in existing and stored.get(i) != wanted[i][1]]
+    # Chroma cannot update a chunk to empty metadata; re-add those instead.
+    moved = [i for i in changed if wanted[i][1]]
+    readd = [i for i in changed if not wanted[i][1]]
+    stale = sorted(existing - wanted.keys()) + readd
+    new = [i for i in wanted if i not in existing] + readd
+
+    for batch in _batches(stale, batch_size):
+        vectordb.delete(ids=batch)
+    for batch in _batches(moved, batch_size):
+        vectordb._collection.update(ids=batch, metadatas=[wanted[i][1] for i in batch])
+    for batch in _batches(new, batch_size):
+        vectordb.add_texts(
+            texts=[wanted[i][0] for i in batch],
+            metadatas=[wanted[i][1] for i in batch],
+            ids=batch,
+        )
+    if stale or new or moved or manifest is None:
+        _save_manifest(persist_dir, _manifest(embeddings, wanted))
+        vectordb.persist()
     return vectordb
 
 
-def retrieve_context(vectordb: Chroma, query: str, k: int = 6) -> list[str]:
+def build_numpy_store(kb: Iterable[Union[str, Clause]],
+                      persist_dir: str = "numpy_db") -> NumpyRetriever:
+    """
+    Chroma-free alternative to build_vectorstore for small KBs: the chunks
+    live in one in-memory float32 matrix (see numpy_retriever.py). The
+    matrix is saved with np.save and memory-mapped back when the KB and
+    model are unchanged; otherwise it is rebuilt, with unchanged chunks
+    served from the embedding cache.
+    """
+    wanted = _chunks(kb)
+    ids = sorted(wanted)
+    embeddings = build_embeddings()
+
+    manifest = _load_manifest(persist_dir)
+    if manifest == _manifest(embeddings, wanted):
+        try:
+            return NumpyRetriever.load(persist_dir, embeddings)
+        except (OSError, ValueError):
+            pass  # missing or corrupt files: rebuild below
+
+    store = NumpyRetriever.from_texts(
+        [wanted[i][0] for i in ids],
+        embeddings,
+        metadatas=[wanted[i][1] for i in ids],
+    )
+    store.save(persist_dir)
+    _save_manifest(persist_dir, _manifest(embeddings, wanted))
+    return store
+
+
+def retrieve_context(vectordb: Chroma | NumpyRetriever, query: str, k: int = 6) -> list[str]:
     results = vectordb.similarity_search(query, k=k)
-    return [d.page_content for d in results]
\ No newline at end of file
+    return [d.page_content for d in results]
+
+
+def embed_queries(embeddings, queries: Sequence[str],
+                  batch_size: int = QUERY_BATCH_SIZE) -> List[List[float]]:
+    """All `queries` in one encode call (falls back to one call per query)."""
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(list(queries), batch_size=batch_size)
+    return [embeddings.embed_query(q) for q in queries]
+
+
+@dataclass
+class CandidatePool:
+    """
+    Over-fetched first-pass results for one query: the candidate texts, best
+    first, with their unit vectors and the query's. Later rounds re-rank the
+    pool locally instead of searching the store again.
+    """
+    query_vector: np.ndarray  # (d,)
+    texts: List[str]
+    vectors: np.ndarray       # (n, d)
+    k: int = 0                # size that was asked for (n is smaller for tiny stores)
+
+    def top(self, vector: np.ndarray, k: int) -> np.ndarray:
+        """Pool indices of the k candidates closest to `vector`, best first."""
+        if not self.texts:
+            return np.empty(0, dtype=np.intp)
+        idx, _ = _top_k(self.vectors @ _normalise(vector), k)
+        return idx
+
+    def scores(self, idx: np.ndarray, vector: Optional[np.ndarray] = None) -> List[float]:
+        """Cosine similarity of `vector` (default: the query) to the candidates at `idx`."""
+        if not len(idx):
+            return []
+        vector = self.query_vector if vector is None else _normalise(vector)
+        return (self.vectors[idx] @ vector).tolist()
+
+    def feedback(self, idx: np.ndarray, beta: float = 0.5) -> np.ndarray:
+        """
+        Rocchio refinement: the query moved towards the mean of the
+        candidates at `idx`, as a unit vector to re-rank the pool with
+        (top); no model call and no store search.
+        """
+        if not len(idx):
+            return self.query_vector
+        return _normalise(self.query_vector + beta * _normalise(self.vectors[idx].mean(axis=0)))
+
+
+def retrieve_candidates_batch(vectordb: Chroma | NumpyRetriever, queries: Sequence[str],
+                              k: int = 24, batch_size: int = QUERY_BATCH_SIZE) -> List[CandidatePool]:
+    """
+    Top-k candidates with their vectors for many queries: the queries are
+    embedded together and searched as one call (one matmul for
+    NumpyRetriever, one collection query for Chroma).
+    """
+    if not queries:
+        return []
+    query_vectors = _normalise(np.asarray(embed_queries(vectordb.embeddings, queries, batch_size)))
+    if isinstance(vectordb, NumpyRetriever):
+        idx, _ = vectordb.search_vectors(query_vectors, k)
+        return [
+            CandidatePool(q, [vectordb.texts[i] for i in row], np.asarray(vectordb.matrix[row]), k)
+            for q, row in zip(query_vectors, idx)
+        ]
+
+    n_results = min(k, vectordb._collection.count())
+    if n_results == 0:
+        empty = np.zeros((0, query_vectors.shape[-1]), dtype=np.float32)
+        return [CandidatePool(q, [], empty, k) for q in query_vectors]
+    res = vectordb._collection.query(query_embeddings=query_vectors.tolist(), n_results=n_results,
+                                     include=["documents", "embeddings"])
+    return [
+        CandidatePool(q, list(docs), _normalise(np.asarray(vectors)), k)
+        for q, docs, vectors in zip(query_vectors, res["documents"], res["embeddings"])
+    ]
+
+
+def retrieve_candidates(vectordb: Chroma | NumpyRetriever, query: str, k: int = 24) -> CandidatePool:
+    return retrieve_candidates_batch(vectordb, [query], k=k)[0]
+
+
+def retrieve_context_batch(vectordb: Chroma | NumpyRetriever, queries: Sequence[str], k: int = 6,
+                           batch_size: int = QUERY_BATCH_SIZE) -> list[list[str]]:
+    """retrieve_context for many queries, embedded and searched together."""
+    return [pool.texts for pool in retrieve_candidates_batch(vectordb, queries, k, batch_size)]
@@ -1,26 +1,36 @@
 from kb_loader import load_kb_lines
 from rag_store import build_vectorstore
-from graph_app import build_graph
+from graph_app import build_graph, calibrate_relevance, run_graph_batch
+
+# Smoke queries, none of them in graph_app.CALIBRATION_QUERIES, with
+# whether the KB covers them: covered queries should be judged relevant
+# on the first pass, the rest should take a refine round.
+SMOKE_QUERIES = [
+    ("Is homer the parent of bart?", True),
+    ("Does monty_burns own the springfield_nuclear_plant?", True),
+    ("Is lisa smart?", True),
+    ("Is bart kind?", True),  # likely false based on facts
+    ("Is ned friend of homer?", True),
+    ("Who painted the Mona Lisa?", False),
+]
 
 
 def run_smoke_tests():
     kb = load_kb_lines("simpsons_kb.pl")
     db = build_vectorstore(kb, persist_dir="chroma_db_test")
-    app = build_graph(db)
-
-    queries = [
-        "Is homer the parent of bart?",
-        "Does monty_burns own the springfield_nuclear_plant?",
-        "Is lisa smart?",
-        "Is bart kind?",  # likely false based on facts
-        "Is ned friend of homer?",
-    ]
+    threshold = calibrate_relevance(db)
+    print(f"Calibrated relevance threshold: {threshold:.3f}")
+    app = build_graph(db, relevance_threshold=threshold)
 
-    for q in queries:
-        out = app.invoke({"query": q})
+    queries = [q for q, _ in SMOKE_QUERIES]
+    for (q, covered), out in zip(SMOKE_QUERIES, run_graph_batch(app, db, queries)):
         print("\n=============================")
         print("Q:", q)
-        print("Relevance:", out.get("relevance"), "| refine_round:", out.get("refine_round"))
+        first_pass = out.get("refine_round", 0) == 0
+        print("Threshold check:", "OK" if first_pass == covered else
+              f"MISMATCH (expected {'no refine' if covered else 'a refine round'})")
+        print("Relevance:", out.get("relevance"), "| refine_round:", out.get("refine_round"),
+              "| retrievals_saved:", out.get("retrievals_saved"))
         print("Answer:", out.get("final_answer"))
         print("Trace:", out.get("inference_trace"))
 